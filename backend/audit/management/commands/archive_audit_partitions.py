@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from audit.partitions import archive_partitions, is_supported
+
+
+class Command(BaseCommand):
+    help = (
+        "Detaches AuditLog partitions older than the retention period, exports "
+        "them to gzip-compressed CSV files and drops them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-months', type=int, default=settings.AUDIT_RETENTION_MONTHS)
+        parser.add_argument('--directory', default=settings.AUDIT_ARCHIVE_DIR)
+        parser.add_argument('--no-export', action='store_true', help="Drop expired partitions without exporting them.")
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError("AuditLog partitioning requires PostgreSQL with the audit migrations applied.")
+
+        directory = None if options['no_export'] else options['directory']
+        archived = archive_partitions(options['retention_months'], directory)
+
+        for name, path in archived:
+            self.stdout.write(f"Archived {name}" + (f" to {path}" if path else ""))
+        if not archived:
+            self.stdout.write("No partitions past the retention period")
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from audit.partitions import ensure_partitions, is_supported
+
+
+class Command(BaseCommand):
+    help = "Creates monthly AuditLog partitions for the current month and the months ahead."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=settings.AUDIT_PARTITION_MONTHS_AHEAD)
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError("AuditLog partitioning requires PostgreSQL with the audit migrations applied.")
+
+        created = ensure_partitions(options['months_ahead'])
+        for name in created:
+            self.stdout.write(f"Created partition {name}")
+        if not created:
+            self.stdout.write("All partitions already exist")
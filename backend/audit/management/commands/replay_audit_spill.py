@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from audit.utils.audit import replay_spill
+
+
+class Command(BaseCommand):
+    help = "Loads audit records spilled to disk by the batching writer back into AuditLog."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=settings.AUDIT_SPILL_PATH)
+        parser.add_argument('--batch-size', type=int, default=settings.AUDIT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        replayed = replay_spill(options['path'], options['batch_size'])
+        self.stdout.write(f"Replayed {replayed} audit records")
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.11 on 2026-10-18 12:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0003_alter_auditlog_timestamp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_audit_user_id_292c79_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_audit_action_86e815_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_audit_timesta_19e18a_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_audit_target__3eb7a1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_audit_user_id_e8be02_idx',
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='audit_audit_timesta_bb2b35_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='audit_audit_user_id_a6d9fe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['action', '-timestamp', '-id'], name='audit_audit_action_0a570c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['target_type', 'target_id', '-timestamp', '-id'], name='audit_audit_target__183b79_idx'),
+        ),
+    ]
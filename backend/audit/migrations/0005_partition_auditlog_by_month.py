@@ -0,0 +1,107 @@
+import re
+from datetime import date
+
+from django.db import migrations
+
+TABLE = 'audit_auditlog'
+LEGACY = 'audit_auditlog_legacy'
+MONTHS_AHEAD = 3
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(cursor):
+    cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE])
+    return cursor.fetchone() is not None
+
+
+def create_month_partitions(cursor):
+    cursor.execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT')
+
+    cursor.execute(f'SELECT min("timestamp") FROM "{LEGACY}"')
+    oldest = cursor.fetchone()[0]
+    today = date.today()
+    month = date(oldest.year, oldest.month, 1) if oldest else date(today.year, today.month, 1)
+    last = add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}_p{month:%Y%m}" PARTITION OF "{TABLE}" '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        )
+        month = add_months(month, 1)
+
+
+# Rebuilds the table under its own name with the rows, secondary indexes
+# and foreign keys of the old one. The old table and its primary key are
+# renamed out of the way first, so every name can be reused.
+def rebuild_table(cursor, partitioned):
+    cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{LEGACY}"')
+    cursor.execute(f'ALTER TABLE "{LEGACY}" RENAME CONSTRAINT "{TABLE}_pkey" TO "{LEGACY}_pkey"')
+
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT LIKE %s",
+        [LEGACY, '%_pkey']
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [LEGACY]
+    )
+    foreign_keys = cursor.fetchall()
+
+    if partitioned:
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{LEGACY}" INCLUDING DEFAULTS INCLUDING STORAGE) '
+            'PARTITION BY RANGE ("timestamp")'
+        )
+        # Postgres requires the partition key in every unique constraint.
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey" PRIMARY KEY ("id", "timestamp")')
+        create_month_partitions(cursor)
+    else:
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{LEGACY}" INCLUDING DEFAULTS INCLUDING STORAGE)'
+        )
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey" PRIMARY KEY ("id")')
+
+    cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{LEGACY}"')
+    cursor.execute(f'DROP TABLE "{LEGACY}"')
+
+    for name, definition in indexes:
+        definition = re.sub(rf' ON (ONLY )?(\S+\.)?"?{LEGACY}"? ', f' ON "{TABLE}" ', definition)
+        cursor.execute(definition)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{name}" {definition}')
+
+
+def partition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            rebuild_table(cursor, partitioned=True)
+
+
+# Back to a plain table keyed on id, which is what 0004 expects.
+def unpartition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            rebuild_table(cursor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0004_auditlog_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
@@ -1,15 +1,16 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from config.constants import AuditAction
 
 class AuditLog(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, db_index=False)
     action = models.CharField(max_length=20, choices=AuditAction.choices)
     target_type = models.CharField(max_length=50, blank=True, null=True)  
     target_id = models.UUIDField(blank=True, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     old_data = models.JSONField(blank=True, null=True)
     new_data = models.JSONField(blank=True, null=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
@@ -18,11 +19,10 @@ class AuditLog(models.Model):
     class Meta:
         ordering = ['-timestamp']
         indexes = [
-        models.Index(fields=['user']),
-        models.Index(fields=['action']),
-        models.Index(fields=['timestamp']),
-        models.Index(fields=['target_type']),
-        models.Index(fields=['user', 'timestamp']),
+        models.Index(fields=['-timestamp', '-id']),
+        models.Index(fields=['user', '-timestamp', '-id']),
+        models.Index(fields=['action', '-timestamp', '-id']),
+        models.Index(fields=['target_type', 'target_id', '-timestamp', '-id']),
     ]
 
     def __str__(self):
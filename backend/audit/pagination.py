@@ -0,0 +1,7 @@
+from config.pagination import KeysetPagination
+
+
+class AuditLogPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 100
+    max_page_size = 1000
@@ -0,0 +1,143 @@
+import gzip
+import os
+import re
+from datetime import date
+
+from django.db import connection, transaction
+
+from audit.models import AuditLog
+
+TABLE = AuditLog._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_RE = re.compile(rf"^{TABLE}_p(\d{{4}})(\d{{2}})$")
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+        [TABLE]
+    )
+    return cursor.fetchone() is not None
+
+
+# PostgreSQL with migration 0005 applied; partition DDL fails otherwise.
+def is_supported():
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        return is_partitioned(cursor)
+
+
+def list_partitions(cursor):
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+        """,
+        [TABLE]
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = PARTITION_RE.match(name)
+        if match:
+            partitions[name] = date(int(match[1]), int(match[2]), 1)
+    return partitions
+
+
+def _partition_ddl(month):
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF "{TABLE}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+# PostgreSQL refuses to create a partition while the DEFAULT partition
+# holds rows in its range, so those rows are moved out first: detach
+# DEFAULT, create the month, re-insert the rows through the parent and
+# attach DEFAULT again, all in one transaction.
+def create_partition(cursor, month):
+    bounds = [month, add_months(month, 1)]
+    cursor.execute(
+        f'SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE "timestamp" >= %s AND "timestamp" < %s LIMIT 1',
+        bounds
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(_partition_ddl(month))
+        return
+
+    with transaction.atomic():
+        cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{DEFAULT_PARTITION}"')
+        cursor.execute(_partition_ddl(month))
+        cursor.execute(
+            f'INSERT INTO "{TABLE}" SELECT * FROM "{DEFAULT_PARTITION}" '
+            f'WHERE "timestamp" >= %s AND "timestamp" < %s',
+            bounds
+        )
+        cursor.execute(
+            f'DELETE FROM "{DEFAULT_PARTITION}" WHERE "timestamp" >= %s AND "timestamp" < %s',
+            bounds
+        )
+        cursor.execute(f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT')
+
+
+def ensure_partitions(months_ahead, today=None):
+    today = month_start(today or date.today())
+    created = []
+
+    with connection.cursor() as cursor:
+        existing = list_partitions(cursor)
+        for offset in range(months_ahead + 1):
+            month = add_months(today, offset)
+            if partition_name(month) not in existing:
+                create_partition(cursor, month)
+                created.append(partition_name(month))
+
+    return created
+
+
+def export_partition(cursor, name, directory):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.csv.gz")
+
+    with open(path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+            cursor.cursor.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', f)
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    return path
+
+
+def archive_partitions(retention_months, directory=None, today=None):
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+    archived = []
+
+    with connection.cursor() as cursor:
+        for name, month in sorted(list_partitions(cursor).items(), key=lambda item: item[1]):
+            if month >= cutoff:
+                continue
+
+            with transaction.atomic():
+                cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+                path = export_partition(cursor, name, directory) if directory else None
+                cursor.execute(f'DROP TABLE "{name}"')
+            archived.append((name, path))
+
+    return archived
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import AuditLog
+from config.constants import AuditAction
 
 class AuditLogSerializer(serializers.ModelSerializer):
     user_email = serializers.EmailField(source='user.email', read_only=True)
@@ -17,4 +18,36 @@ class AuditLogSerializer(serializers.ModelSerializer):
             'old_data',
             'new_data',
             'ip_address',
-        ]
\ No newline at end of file
+        ]
+
+
+class AuditLogLightSerializer(serializers.ModelSerializer):
+    user_email = serializers.EmailField(source='user.email', read_only=True)
+
+    class Meta:
+        model = AuditLog
+        fields = [
+            'id',
+            'user',
+            'user_email',
+            'action',
+            'target_type',
+            'target_id',
+            'timestamp',
+        ]
+
+
+class AuditLogFilterSerializer(serializers.Serializer):
+    user = serializers.UUIDField(required=False)
+    action = serializers.ChoiceField(choices=AuditAction.choices, required=False)
+    target_type = serializers.CharField(max_length=50, required=False)
+    target_id = serializers.UUIDField(required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    fields = serializers.ChoiceField(choices=['full', 'light'], default='full')
+
+    # The only index covering target_id is led by target_type.
+    def validate(self, attrs):
+        if 'target_id' in attrs and 'target_type' not in attrs:
+            raise serializers.ValidationError({"target_type": "Required when filtering by target_id."})
+        return attrs
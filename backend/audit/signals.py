@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent by replay_spill inside the transaction that inserted `records`
+# (AuditLog instances not previously stored), so listeners that derive
+# data from audit rows by timestamp can account for late arrivals.
+records_replayed = Signal()
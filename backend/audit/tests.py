@@ -1,3 +1,232 @@
-from django.test import TestCase
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from importlib import import_module
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from audit import partitions
+from audit.models import AuditLog
+from audit.signals import records_replayed
+from audit.utils.audit import AuditWriter, log_action, log_actions, replay_spill
+from users.models import User
+
+
+class AuditLogApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@example.com', 'pass', full_name='Admin')
+        cls.user = User.objects.create_user('user@example.com', 'pass', full_name='User')
+
+        now = timezone.now()
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                user=cls.user if index % 2 else cls.admin,
+                action='DOWNLOAD' if index % 3 else 'SHARE',
+                target_type='Document',
+                timestamp=now - timedelta(minutes=index),
+                new_data={'index': index}
+            )
+            for index in range(25)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_pages_are_constant_cost_and_complete(self):
+        seen = []
+        url = '/api/audit/?page_size=10'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_filters(self):
+        response = self.client.get('/api/audit/', {'user': str(self.user.id), 'action': 'DOWNLOAD'})
+        rows = response.data['results']
+        self.assertTrue(rows)
+        self.assertTrue(all(row['user_email'] == self.user.email and row['action'] == 'DOWNLOAD' for row in rows))
+
+        since = (timezone.now() - timedelta(minutes=4, seconds=30)).isoformat()
+        response = self.client.get('/api/audit/', {'since': since})
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_light_projection(self):
+        response = self.client.get('/api/audit/', {'fields': 'light'})
+        self.assertNotIn('new_data', response.data['results'][0])
+
+    def test_invalid_filter(self):
+        response = self.client.get('/api/audit/', {'action': 'NOPE'})
+        self.assertEqual(response.status_code, 400)
+
+        target_id = uuid.uuid4()
+        response = self.client.get('/api/audit/', {'target_id': target_id})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/audit/', {'target_id': target_id, 'target_type': 'Document'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_non_admin_forbidden(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/audit/').status_code, 403)
+
+
+class AuditWriterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('writer@example.com', 'pass', full_name='User')
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.spill_path = os.path.join(tmp.name, 'spill.jsonl')
+        self.writer = AuditWriter(batch_size=2, flush_interval=0.1, max_queue=10, spill_path=self.spill_path)
+
+    def records(self, count):
+        records = []
+        for index in range(count):
+            with mock.patch('audit.utils.audit.audit_writer.submit', records.append):
+                with self.captureOnCommitCallbacks(execute=True), override_settings(AUDIT_WRITER_MODE='batch'):
+                    log_action(self.user, 'DOWNLOAD', 'Document', new_data={'index': index})
+        return records
+
+    def test_failed_batch_is_spilled_and_replayed(self):
+        records = self.records(3)
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=RuntimeError), \
+                mock.patch('audit.utils.audit.connection.close'), \
+                self.assertLogs('audit.utils.audit', 'ERROR'):
+            self.writer.write(records)
+        self.assertEqual(self.writer.spilled, 3)
+        self.assertFalse(AuditLog.objects.exists())
+
+        replayed = []
+        handler = lambda sender, records, **kwargs: replayed.extend(records)
+        records_replayed.connect(handler)
+        self.addCleanup(records_replayed.disconnect, handler)
+
+        self.assertEqual(replay_spill(self.spill_path, batch_size=2), 3)
+        self.assertFalse(os.path.exists(self.spill_path))
+        self.assertEqual(
+            sorted(log.new_data['index'] for log in AuditLog.objects.all()),
+            [0, 1, 2]
+        )
+        self.assertEqual({log.id for log in replayed}, {record['id'] for record in records})
+        # Spilled timestamps keep millisecond precision.
+        self.assertAlmostEqual(
+            AuditLog.objects.get(new_data__index=0).timestamp,
+            records[0]['timestamp'],
+            delta=timedelta(milliseconds=1)
+        )
+
+    def test_interrupted_replay_does_not_duplicate(self):
+        records = self.records(3)
+        self.writer.spill(records)
+        AuditLog.objects.create(**records[0])
+        os.replace(self.spill_path, f"{self.spill_path}.replaying")
+
+        self.assertEqual(replay_spill(self.spill_path, batch_size=2), 2)
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertEqual(replay_spill(self.spill_path, batch_size=2), 0)
+
+    @override_settings(AUDIT_WRITER_MODE='batch')
+    def test_batch_mode_submits_on_commit(self):
+        submitted = []
+        with mock.patch('audit.utils.audit.audit_writer.submit', submitted.append):
+            with self.captureOnCommitCallbacks(execute=True):
+                log_action(self.user, 'DOWNLOAD', 'Document')
+                log_actions([{'user': self.user, 'action': 'SHARE'}, {'user': self.user, 'action': 'SHARE'}])
+                self.assertEqual(submitted, [])
+            self.assertEqual([record['action'] for record in submitted], ['DOWNLOAD', 'SHARE', 'SHARE'])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        log_action(self.user, 'DELETE', 'Document')
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+            self.assertEqual(len(submitted), 3)
+        self.assertFalse(AuditLog.objects.exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', "AuditLog partitioning is PostgreSQL only")
+class AuditPartitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('partition@example.com', 'pass', full_name='User')
+
+    def setUp(self):
+        # Rows inserted inside the test transaction would otherwise leave
+        # deferred FK checks pending, and Postgres refuses DROP TABLE then.
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    def partition_of(self, log):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text FROM "{partitions.TABLE}" WHERE id = %s', [log.id])
+            return cursor.fetchone()[0]
+
+    def test_rows_are_routed_to_monthly_partitions(self):
+        self.assertTrue(partitions.is_supported())
+
+        log = AuditLog.objects.create(user=self.user, action='LOGIN')
+        self.assertEqual(self.partition_of(log), partitions.partition_name(partitions.month_start(log.timestamp)))
+
+        old = AuditLog.objects.create(user=self.user, action='LOGIN', timestamp=timezone.now() - timedelta(days=3650))
+        self.assertEqual(self.partition_of(old), partitions.DEFAULT_PARTITION)
+
+    def test_ensure_and_archive_partitions(self):
+        today = timezone.now().date()
+        created = partitions.ensure_partitions(12, today=today)
+        self.assertIn(partitions.partition_name(partitions.add_months(today, 12)), created)
+        self.assertEqual(partitions.ensure_partitions(12, today=today), [])
+
+        log = AuditLog.objects.create(user=self.user, action='LOGIN')
+        partition = self.partition_of(log)
+        later = partitions.add_months(today, 12)
+        archived = [name for name, path in partitions.archive_partitions(3, today=later)]
+        self.assertIn(partition, archived)
+        self.assertFalse(AuditLog.objects.filter(pk=log.pk).exists())
+
+    def test_new_partition_takes_rows_from_default(self):
+        today = timezone.now().date()
+        month = partitions.add_months(partitions.month_start(today), 30)
+        next_month = partitions.add_months(month, 1)
+
+        def log(day):
+            return AuditLog.objects.create(
+                user=self.user,
+                action='LOGIN',
+                timestamp=datetime(day.year, day.month, 3, tzinfo=dt_timezone.utc)
+            )
+
+        early, later = log(month), log(next_month)
+        self.assertEqual(self.partition_of(early), partitions.DEFAULT_PARTITION)
+
+        self.assertIn(partitions.partition_name(month), partitions.ensure_partitions(30, today=today))
+        self.assertEqual(self.partition_of(early), partitions.partition_name(month))
+        self.assertEqual(self.partition_of(later), partitions.DEFAULT_PARTITION)
+        self.assertEqual(AuditLog.objects.filter(pk__in=[early.pk, later.pk]).count(), 2)
+
+    def test_migration_reverses_and_reapplies(self):
+        migration = import_module('audit.migrations.0005_partition_auditlog_by_month')
+        AuditLog.objects.create(user=self.user, action='LOGIN')
+
+        with connection.cursor() as cursor:
+            migration.rebuild_table(cursor, partitioned=False)
+            self.assertFalse(partitions.is_partitioned(cursor))
+            self.assertEqual(AuditLog.objects.count(), 1)
+
+            migration.rebuild_table(cursor, partitioned=True)
+            self.assertTrue(partitions.is_partitioned(cursor))
+            self.assertEqual(AuditLog.objects.filter(user=self.user).count(), 1)
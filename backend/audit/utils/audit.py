@@ -1,12 +1,240 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
 from audit.models import AuditLog
+from audit.signals import records_replayed
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class AuditWriter:
+    def __init__(self, batch_size, flush_interval, max_queue, spill_path):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self.flushed = 0
+        self.batches = 0
+        self.spilled = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def submit(self, record):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.spill([record])
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                return
+
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            stopping = False
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+
+            self.write(batch)
+            if stopping:
+                return
+
+    def close(self, timeout=5.0):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+                self._thread.join(timeout)
+            except queue.Full:
+                pass
+        self.flush()
+
+    def flush(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        for start in range(0, len(batch), self.batch_size):
+            self.write(batch[start:start + self.batch_size])
+
+    def write(self, batch):
+        started = time.monotonic()
+        try:
+            AuditLog.objects.bulk_create([AuditLog(**record) for record in batch])
+        except Exception:
+            logger.exception("Audit batch insert failed, spilling %s records to disk", len(batch))
+            connection.close()
+            self.spill(batch)
+            return
+
+        elapsed = (time.monotonic() - started) * 1000
+        self.flushed += len(batch)
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+
+    def spill(self, batch):
+        with self._lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for record in batch:
+                    f.write(json.dumps(record, cls=DjangoJSONEncoder) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        self.spilled += len(batch)
+
+    def stats(self):
+        return {
+            "mode": settings.AUDIT_WRITER_MODE,
+            "queue_depth": self._queue.qsize(),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "spilled": self.spilled,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": self.flushed / self.batches if self.batches else 0,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+
+audit_writer = AuditWriter(
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+    max_queue=settings.AUDIT_QUEUE_MAX,
+    spill_path=settings.AUDIT_SPILL_PATH
+)
+atexit.register(audit_writer.close)
+
+
+def _record(user, action, target_type, target_id, old_data, new_data, ip_address):
+    return {
+        "id": uuid.uuid4(),
+        "user_id": user.pk if user is not None and user.is_authenticated else None,
+        "action": action,
+        "target_type": target_type,
+        "target_id": target_id,
+        "timestamp": timezone.now(),
+        "old_data": old_data,
+        "new_data": new_data,
+        "ip_address": ip_address,
+    }
+
 
 def log_action(user, action, target_type=None, target_id=None,  old_data=None, new_data=None, ip_address=None):
-    AuditLog.objects.create(
-        user=user,
-        action=action,
-        target_type=target_type,
-        target_id=target_id,
-        old_data=old_data,
-        new_data=new_data,
-        ip_address=ip_address
-    )
\ No newline at end of file
+    record = _record(user, action, target_type, target_id, old_data, new_data, ip_address)
+
+    # Queued rows are written outside the request's transaction, so they
+    # are only handed over once it commits; a rollback drops them.
+    if settings.AUDIT_WRITER_MODE == 'batch':
+        transaction.on_commit(lambda: audit_writer.submit(record))
+    else:
+        AuditLog.objects.create(**record)
+
+
+def log_actions(entries):
+    records = [
+        _record(
+            entry.get('user'),
+            entry['action'],
+            entry.get('target_type'),
+            entry.get('target_id'),
+            entry.get('old_data'),
+            entry.get('new_data'),
+            entry.get('ip_address')
+        )
+        for entry in entries
+    ]
+
+    if settings.AUDIT_WRITER_MODE == 'batch':
+        def submit():
+            for record in records:
+                audit_writer.submit(record)
+        transaction.on_commit(submit)
+    else:
+        AuditLog.objects.bulk_create([AuditLog(**record) for record in records])
+
+
+def _replay_batch(records):
+    with transaction.atomic():
+        existing = set(
+            AuditLog.objects.filter(id__in=[record.id for record in records]).values_list('id', flat=True)
+        )
+        records = [record for record in records if record.id not in existing]
+
+        AuditLog.objects.bulk_create(records, ignore_conflicts=True)
+        records_replayed.send(sender=AuditLog, records=records)
+    return len(records)
+
+
+# Records already stored by an interrupted earlier replay are skipped, so
+# a file can be replayed again after a crash.
+def replay_spill(path, batch_size):
+    replaying = f"{path}.replaying"
+    if not os.path.exists(replaying):
+        if not os.path.exists(path):
+            return 0
+        os.replace(path, replaying)
+
+    replayed = 0
+    with open(replaying, encoding='utf-8') as f:
+        batch = []
+        for line in f:
+            record = json.loads(line)
+            record['id'] = uuid.UUID(record['id'])
+            record['timestamp'] = parse_datetime(record['timestamp'])
+            batch.append(AuditLog(**record))
+
+            if len(batch) >= batch_size:
+                replayed += _replay_batch(batch)
+                batch = []
+
+        if batch:
+            replayed += _replay_batch(batch)
+
+    os.remove(replaying)
+    return replayed
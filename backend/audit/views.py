@@ -2,10 +2,51 @@ from rest_framework import viewsets
 from rest_framework.permissions import IsAdminUser  
 
 from .models import AuditLog
-from .serializers import AuditLogSerializer
+from .pagination import AuditLogPagination
+from .serializers import AuditLogSerializer, AuditLogLightSerializer, AuditLogFilterSerializer
 from .permissions import IsAuditAdmin
 
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
     permission_classes = [IsAuditAdmin]
+    pagination_class = AuditLogPagination
+
+    LIGHT_FIELDS = ['id', 'user', 'user__email', 'action', 'target_type', 'target_id', 'timestamp']
+
+    def get_filters(self):
+        if not hasattr(self, '_filters'):
+            filters = AuditLogFilterSerializer(data=self.request.query_params)
+            filters.is_valid(raise_exception=True)
+            self._filters = filters.validated_data
+        return self._filters
+
+    def get_queryset(self): # type: ignore
+        queryset = AuditLog.objects.select_related('user')
+
+        if self.action != 'list':
+            return queryset
+
+        filters = self.get_filters()
+        if 'user' in filters:
+            queryset = queryset.filter(user_id=filters['user'])
+        if 'action' in filters:
+            queryset = queryset.filter(action=filters['action'])
+        if 'target_type' in filters:
+            queryset = queryset.filter(target_type=filters['target_type'])
+        if 'target_id' in filters:
+            queryset = queryset.filter(target_id=filters['target_id'])
+        if 'since' in filters:
+            queryset = queryset.filter(timestamp__gte=filters['since'])
+        if 'until' in filters:
+            queryset = queryset.filter(timestamp__lt=filters['until'])
+
+        if filters['fields'] == 'light':
+            queryset = queryset.only(*self.LIGHT_FIELDS)
+
+        return queryset
+
+    def get_serializer_class(self): # type: ignore
+        if self.action == 'list' and self.get_filters()['fields'] == 'light':
+            return AuditLogLightSerializer
+        return AuditLogSerializer
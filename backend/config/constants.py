@@ -25,3 +25,21 @@ STATUS_CHOICES = [
     ('approved', 'Approved'),         
 ]
 
+
+ENCRYPTION_FORMAT_CHOICES = [
+    ('fernet', 'Fernet (whole file)'),
+    ('segmented', 'Segmented AES-GCM stream'),
+]
+
+
+STORAGE_KIND_CHOICES = [
+    ('full', 'Full copy'),
+    ('delta', 'Delta against base version'),
+]
+
+
+KEY_ROTATION_STATUS_CHOICES = [
+    ('running', 'Running'),
+    ('completed', 'Completed'),
+    ('failed', 'Failed'),
+]
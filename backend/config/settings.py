@@ -101,6 +101,7 @@ INSTALLED_APPS = [
     'users',
     'documents',
     'audit',
+    'reports',
 ]
 
 MIDDLEWARE = [
@@ -189,6 +190,155 @@ STATIC_URL = 'static/'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Encrypted document blobs go to the 'documents' storage. Any BlobStorage
+# works: LocalBlobStorage keeps them under MEDIA_ROOT, InMemoryS3Storage
+# is an in-process S3 stand-in for tests.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+    "documents": {
+        "BACKEND": os.getenv('DOCUMENTS_STORAGE_BACKEND', 'documents.utils.storage.LocalBlobStorage'),
+        "OPTIONS": {
+            "part_size": int(os.getenv('DOCUMENTS_STORAGE_PART_SIZE', 8 * 1024 * 1024)),
+            "workers": int(os.getenv('DOCUMENTS_STORAGE_WORKERS', 4)),
+        },
+    },
+}
+
+
+# Users
+
+# Pre-generated RSA key pairs handed out by UserManager.create_user. The
+# fill_key_pool command refills the pool up to the target once it drops
+# below the low-water mark.
+USERS_KEY_POOL_LOW_WATER = int(os.getenv('USERS_KEY_POOL_LOW_WATER', 50))
+USERS_KEY_POOL_TARGET = int(os.getenv('USERS_KEY_POOL_TARGET', 200))
+
+# Key rotation re-wraps DEKs in batches of BATCH_SIZE on WORKERS processes
+# (rotate_user_keys). With IN_PROCESS the rotation API also runs started
+# rotations on a background thread of the web process, one batch at a
+# time; otherwise they wait for rotate_user_keys --loop.
+USERS_KEY_ROTATION_BATCH_SIZE = int(os.getenv('USERS_KEY_ROTATION_BATCH_SIZE', 200))
+USERS_KEY_ROTATION_WORKERS = int(os.getenv('USERS_KEY_ROTATION_WORKERS', os.cpu_count() or 1))
+USERS_KEY_ROTATION_IN_PROCESS = os.getenv('USERS_KEY_ROTATION_IN_PROCESS', 'False') == 'True'
+
+# A runner claims a rotation and renews its lease with every batch; a lease
+# older than LEASE seconds may be taken over. Failed rotations are retried
+# after RETRY_DELAY * 2**attempts seconds, at most MAX_ATTEMPTS times.
+USERS_KEY_ROTATION_LEASE = int(os.getenv('USERS_KEY_ROTATION_LEASE', 300))
+USERS_KEY_ROTATION_RETRY_DELAY = int(os.getenv('USERS_KEY_ROTATION_RETRY_DELAY', 60))
+USERS_KEY_ROTATION_MAX_ATTEMPTS = int(os.getenv('USERS_KEY_ROTATION_MAX_ATTEMPTS', 5))
+
+
+# Audit
+
+# 'sync' writes every audit row inside the request; 'batch' queues rows and
+# a background thread flushes them with bulk_create by size or interval.
+# Rows that cannot be written are appended to AUDIT_SPILL_PATH and loaded
+# back with the replay_audit_spill command.
+AUDIT_WRITER_MODE = os.getenv('AUDIT_WRITER_MODE', 'sync')
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 200))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0))
+AUDIT_QUEUE_MAX = int(os.getenv('AUDIT_QUEUE_MAX', 10000))
+AUDIT_SPILL_PATH = os.getenv('AUDIT_SPILL_PATH', str(BASE_DIR / 'audit_spill.jsonl'))
+
+# On PostgreSQL AuditLog is range-partitioned by month. create_audit_partitions
+# keeps this many months ready ahead; archive_audit_partitions exports and
+# drops partitions older than the retention period.
+AUDIT_PARTITION_MONTHS_AHEAD = int(os.getenv('AUDIT_PARTITION_MONTHS_AHEAD', 3))
+AUDIT_RETENTION_MONTHS = int(os.getenv('AUDIT_RETENTION_MONTHS', 24))
+AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', str(BASE_DIR / 'audit_archive'))
+
+
+# Reports
+
+# Audit rows younger than this many seconds are left out of the rollups
+# until the next run, so rows still queued by the batching writer are
+# not skipped. Keep it above AUDIT_FLUSH_INTERVAL.
+REPORTS_ROLLUP_LAG = int(os.getenv('REPORTS_ROLLUP_LAG', 120))
+
+
+# Documents
+
+# How tokenised downloads are served: 'sendfile' streams through the WSGI
+# server's file_wrapper (os.sendfile under gunicorn), 'x-accel-redirect'
+# and 'x-sendfile' hand the transfer to nginx / Apache respectively.
+DOCUMENTS_DOWNLOAD_SERVE_MODE = os.getenv('DOCUMENTS_DOWNLOAD_SERVE_MODE', 'sendfile')
+DOCUMENTS_X_ACCEL_REDIRECT_PREFIX = os.getenv('DOCUMENTS_X_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# Lifetime of download links in seconds. With SIGNED_DOWNLOAD_LINKS the
+# token is an HMAC-signed (django.core.signing) payload of version id,
+# creator and expiry, and no DownloadLink row is stored.
+DOCUMENTS_DOWNLOAD_LINK_TTL = int(os.getenv('DOCUMENTS_DOWNLOAD_LINK_TTL', 60 * 60))
+DOCUMENTS_SIGNED_DOWNLOAD_LINKS = os.getenv('DOCUMENTS_SIGNED_DOWNLOAD_LINKS', 'False') == 'True'
+
+# Per-process cache of parsed RSA private keys (seconds for TTL).
+DOCUMENTS_PRIVATE_KEY_CACHE_SIZE = int(os.getenv('DOCUMENTS_PRIVATE_KEY_CACHE_SIZE', 256))
+DOCUMENTS_PRIVATE_KEY_CACHE_TTL = int(os.getenv('DOCUMENTS_PRIVATE_KEY_CACHE_TTL', 300))
+
+# Opt-in cache of unwrapped DEKs per (user, document).
+DOCUMENTS_DEK_CACHE_ENABLED = os.getenv('DOCUMENTS_DEK_CACHE_ENABLED', 'False') == 'True'
+DOCUMENTS_DEK_CACHE_SIZE = int(os.getenv('DOCUMENTS_DEK_CACHE_SIZE', 1024))
+DOCUMENTS_DEK_CACHE_TTL = int(os.getenv('DOCUMENTS_DEK_CACHE_TTL', 60))
+
+# Threads used to wrap a DEK for many recipients in share_bulk.
+DOCUMENTS_SHARE_WORKERS = int(os.getenv('DOCUMENTS_SHARE_WORKERS', 8))
+
+# Opt-in delta storage for new versions. A full keyframe is stored every
+# KEYFRAME_INTERVAL versions to cap reconstruction depth, and a delta is
+# only kept when it is at most MAX_RATIO of the plaintext size. Deltas are
+# only made when both the upload and its base are within MAX_SIZE, which
+# bounds the memory needed to diff or rebuild any version.
+DOCUMENTS_DELTA_ENABLED = os.getenv('DOCUMENTS_DELTA_ENABLED', 'False') == 'True'
+DOCUMENTS_DELTA_KEYFRAME_INTERVAL = int(os.getenv('DOCUMENTS_DELTA_KEYFRAME_INTERVAL', 10))
+DOCUMENTS_DELTA_MAX_SIZE = int(os.getenv('DOCUMENTS_DELTA_MAX_SIZE', 8 * 1024 * 1024))
+DOCUMENTS_DELTA_MAX_RATIO = float(os.getenv('DOCUMENTS_DELTA_MAX_RATIO', 0.5))
+
+# Codec applied to plaintext before encryption ('none', 'zlib', 'lzma' or
+# anything added with documents.utils.codecs.register_codec). MIME types
+# matching SKIP_TYPES are stored as is, as are uploads whose first 64 KiB
+# do not compress below MIN_RATIO. Off by default: a compressed version
+# cannot seek, so every Range request on it decompresses from byte 0.
+DOCUMENTS_COMPRESSION_CODEC = os.getenv('DOCUMENTS_COMPRESSION_CODEC', 'none')
+DOCUMENTS_COMPRESSION_MIN_RATIO = float(os.getenv('DOCUMENTS_COMPRESSION_MIN_RATIO', 0.9))
+DOCUMENTS_COMPRESSION_SKIP_TYPES = [
+    'image/*',
+    'video/*',
+    'audio/*',
+    'application/pdf',
+    'application/zip',
+    'application/gzip',
+    'application/x-7z-compressed',
+    'application/x-rar-compressed',
+    'application/x-bzip2',
+    'application/x-xz',
+    'application/vnd.openxmlformats-officedocument.*',
+    'application/vnd.oasis.opendocument.*',
+]
+
+# Resumable upload sessions. Chunk sizes must be a multiple of the 64 KiB
+# encryption segment; sessions expire TTL seconds after their last part.
+DOCUMENTS_UPLOAD_CHUNK_SIZE = int(os.getenv('DOCUMENTS_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+DOCUMENTS_UPLOAD_MAX_CHUNK_SIZE = int(os.getenv('DOCUMENTS_UPLOAD_MAX_CHUNK_SIZE', 64 * 1024 * 1024))
+DOCUMENTS_UPLOAD_SESSION_TTL = int(os.getenv('DOCUMENTS_UPLOAD_SESSION_TTL', 24 * 60 * 60))
+
+# Threads shared by the async download/decrypt views for blob reads and
+# segment decryption, and the chunk size of plain blob reads.
+DOCUMENTS_ASYNC_CRYPTO_WORKERS = int(os.getenv('DOCUMENTS_ASYNC_CRYPTO_WORKERS', 8))
+DOCUMENTS_ASYNC_READ_CHUNK_SIZE = int(os.getenv('DOCUMENTS_ASYNC_READ_CHUNK_SIZE', 256 * 1024))
+
+# Segment encryption/decryption engine: 'serial' (request thread),
+# 'thread' or 'process' pool. WINDOW batches of BATCH_SEGMENTS segments
+# are in flight at most; run manage.py benchmark_crypto to pick a mode.
+DOCUMENTS_CRYPTO_ENGINE = os.getenv('DOCUMENTS_CRYPTO_ENGINE', 'serial')
+DOCUMENTS_CRYPTO_WORKERS = int(os.getenv('DOCUMENTS_CRYPTO_WORKERS', os.cpu_count() or 1))
+DOCUMENTS_CRYPTO_WINDOW = int(os.getenv('DOCUMENTS_CRYPTO_WINDOW', 0)) or None
+DOCUMENTS_CRYPTO_BATCH_SEGMENTS = int(os.getenv('DOCUMENTS_CRYPTO_BATCH_SEGMENTS', 16))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
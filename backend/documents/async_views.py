@@ -0,0 +1,151 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from audit.utils.audit import log_action
+from audit.utils.request import get_client_ip
+from config.constants import AuditAction
+from .models import DocumentAccess
+from .utils.dek import unwrap_document_dek
+from .utils.http import conditional_response, ranged_streaming_response
+from .utils.links import DownloadLinkExpired, aget_download_version
+from .utils.plaintext import PlaintextReader
+from .utils.storage import open_blob_range
+
+# Blob reads and segment decryption run here, so the event loop never
+# blocks and the number of threads stays fixed however many clients are
+# connected. Slow clients only hold a coroutine between chunks.
+crypto_executor = ThreadPoolExecutor(
+    max_workers=settings.DOCUMENTS_ASYNC_CRYPTO_WORKERS,
+    thread_name_prefix='documents-crypto'
+)
+
+_DONE = object()
+_jwt = JWTAuthentication()
+
+
+async def _offload(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(crypto_executor, func, *args)
+
+
+async def _iterate(iterator):
+    try:
+        while True:
+            chunk = await _offload(next, iterator, _DONE)
+            if chunk is _DONE:
+                return
+            yield chunk
+    finally:
+        await _offload(iterator.close)
+
+
+def _read_chunks(fieldfile, start, stop):
+    with open_blob_range(fieldfile, start, stop) as fileobj:
+        while True:
+            chunk = fileobj.read(settings.DOCUMENTS_ASYNC_READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+# The token is validated without I/O; only the user row is loaded.
+async def _authenticate(request):
+    header = _jwt.get_header(request)
+    if header is None:
+        return None
+
+    raw_token = _jwt.get_raw_token(header)
+    if raw_token is None:
+        return None
+
+    try:
+        validated_token = _jwt.get_validated_token(raw_token)
+        return await sync_to_async(_jwt.get_user)(validated_token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+@require_GET
+async def download(request, token):
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    try:
+        version = await aget_download_version(token)
+    except DownloadLinkExpired:
+        return JsonResponse({"detail": "Link expired"}, status=400)
+
+    if version is None:
+        return JsonResponse({"detail": "Not found."}, status=404)
+
+    not_modified = conditional_response(request, version.etag, version.uploaded_at)
+    if not_modified is not None:
+        return not_modified
+
+    await sync_to_async(log_action)(
+        user=user,
+        action=AuditAction.DOWNLOAD,
+        target_type="DocumentVersion",
+        target_id=version.id,
+        old_data=None,
+        new_data={
+            "link_token": str(token)
+        },
+        ip_address=get_client_ip(request)
+    )
+
+    size = await _offload(lambda: version.file.size)
+
+    return ranged_streaming_response(
+        request,
+        lambda start, stop: _iterate(_read_chunks(version.file, start, stop)),
+        size,
+        filename=version.file.name,
+        etag=version.etag,
+        last_modified=version.uploaded_at
+    )
+
+
+@require_GET
+async def decrypt(request, pk):
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    access = await (
+        DocumentAccess.objects.select_related('document')
+        .filter(document_id=pk, document__is_active=True, user=user)
+        .afirst()
+    )
+    if access is None:
+        return JsonResponse({"detail": "No access to this document."}, status=404)
+
+    version = await access.document.versions.afirst()
+    if version is None:
+        return JsonResponse({"detail": "Document has no versions."}, status=404)
+
+    not_modified = conditional_response(request, version.etag, version.uploaded_at)
+    if not_modified is not None:
+        return not_modified
+
+    dek = await _offload(unwrap_document_dek, access, user)
+
+    # Building the reader loads the delta chain through the ORM, so it runs
+    # on the sync thread; the pool then only reads blobs and decrypts.
+    reader = await sync_to_async(PlaintextReader)(version, dek)
+
+    return ranged_streaming_response(
+        request,
+        lambda start, stop: _iterate(reader.stream(start, stop)),
+        reader.size,
+        filename=version.file.name.replace('.enc', ''),
+        etag=version.etag,
+        last_modified=version.uploaded_at
+    )
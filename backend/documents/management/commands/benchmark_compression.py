@@ -0,0 +1,65 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from documents.utils.codecs import codecs, compress_stream, decompress_stream
+from documents.utils.crypto import SEGMENT_SIZE
+
+
+def _sample(size, seed):
+    rng = random.Random(seed)
+    words = ['contract', 'party', 'clause', 'payment', 'invoice', 'amount', 'date', 'signature', 'term', 'notice']
+    rows = []
+    while sum(len(row) for row in rows) < size:
+        rows.append(json.dumps({
+            'id': len(rows),
+            'text': ' '.join(rng.choice(words) for _ in range(12)),
+            'amount': round(rng.uniform(0, 10000), 2),
+        }) + '\n')
+    return ''.join(rows).encode()[:size]
+
+
+def _segments(data):
+    return [data[i:i + SEGMENT_SIZE] for i in range(0, len(data), SEGMENT_SIZE)]
+
+
+class Command(BaseCommand):
+    help = "Reports compression ratio and CPU cost of each registered codec."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help="Files to benchmark; a synthetic text export is used if omitted.")
+        parser.add_argument('--size', type=int, default=8 * 1024 * 1024)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['paths']:
+            samples = []
+            for path in options['paths']:
+                with open(path, 'rb') as f:
+                    samples.append((path, f.read()))
+        else:
+            samples = [('synthetic', _sample(options['size'], options['seed']))]
+
+        for label, data in samples:
+            self.stdout.write(f"{label}: {len(data)} bytes")
+            for name in codecs:
+                started = time.process_time()
+                compressed = b''.join(compress_stream(_segments(data), name))
+                compress_cpu = time.process_time() - started
+
+                started = time.process_time()
+                restored = b''.join(decompress_stream(_segments(compressed), name))
+                decompress_cpu = time.process_time() - started
+
+                if restored != data:
+                    self.stderr.write(f"  {name}: round trip mismatch")
+                    continue
+
+                mib = len(data) / (1024 * 1024)
+                self.stdout.write(
+                    f"  {name:<6} ratio {len(compressed) / len(data):.3f}  "
+                    f"compress {1000 * compress_cpu:.1f} ms CPU ({mib / max(compress_cpu, 1e-9):.1f} MiB/s)  "
+                    f"decompress {1000 * decompress_cpu:.1f} ms CPU ({mib / max(decompress_cpu, 1e-9):.1f} MiB/s)"
+                )
@@ -0,0 +1,74 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.utils.crypto import (
+    SEGMENT_SALT_SIZE,
+    SEGMENT_SIZE,
+    generate_dek,
+    open_batch,
+    seal_batch,
+    segment_header
+)
+from documents.utils.parallel import SegmentEngine
+
+
+def _worker_counts():
+    counts = []
+    count = 1
+    while count < (os.cpu_count() or 1):
+        counts.append(count)
+        count *= 2
+    counts.append(os.cpu_count() or 1)
+    return ','.join(str(count) for count in counts)
+
+
+class Command(BaseCommand):
+    help = "Measures segment encryption/decryption throughput per engine mode and worker count."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=256, help="Plaintext size in MiB.")
+        parser.add_argument('--modes', default='serial,thread,process')
+        parser.add_argument('--workers', default=_worker_counts(), help="Comma-separated worker counts.")
+        parser.add_argument('--batch-segments', type=int, default=settings.DOCUMENTS_CRYPTO_BATCH_SEGMENTS)
+
+    def handle(self, *args, **options):
+        size = options['size'] * 1024 * 1024
+        dek = generate_dek()
+        header = segment_header(os.urandom(SEGMENT_SALT_SIZE))
+
+        # One random segment reused for the whole run keeps the benchmark
+        # about crypto rather than about generating input.
+        block = os.urandom(SEGMENT_SIZE)
+        count = max(1, size // SEGMENT_SIZE)
+        mib = count * SEGMENT_SIZE / (1024 * 1024)
+
+        self.stdout.write(f"{mib:.0f} MiB, {count} segments, {os.cpu_count()} CPUs")
+
+        baseline = None
+        for mode in options['modes'].split(','):
+            workers = [1] if mode == 'serial' else [int(value) for value in options['workers'].split(',')]
+            for worker_count in workers:
+                engine = SegmentEngine(mode, worker_count, batch_segments=options['batch_segments'])
+                try:
+                    tasks = ((index, block, index == count - 1) for index in range(count))
+                    started = time.perf_counter()
+                    sealed = list(engine.run(seal_batch, dek, header, tasks))
+                    encrypt = mib / (time.perf_counter() - started)
+
+                    tasks = ((index, data, index == count - 1) for index, data in enumerate(sealed))
+                    started = time.perf_counter()
+                    for _ in engine.run(open_batch, dek, header, tasks):
+                        pass
+                    decrypt = mib / (time.perf_counter() - started)
+                finally:
+                    engine.shutdown()
+
+                baseline = baseline or encrypt
+                self.stdout.write(
+                    f"  {mode:<8} workers={worker_count:<3} "
+                    f"encrypt {encrypt:8.1f} MiB/s  decrypt {decrypt:8.1f} MiB/s  "
+                    f"({encrypt / baseline:.2f}x)"
+                )
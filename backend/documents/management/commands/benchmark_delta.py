@@ -0,0 +1,101 @@
+import io
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.utils.crypto import decrypt_stream, encrypt_stream, generate_dek
+from documents.utils.delta import apply_delta, make_delta
+
+
+def _encrypt(data, dek):
+    return b''.join(encrypt_stream([data], dek))
+
+
+def _decrypt(ciphertext, dek):
+    return b''.join(decrypt_stream(io.BytesIO(ciphertext), dek, len(ciphertext)))
+
+
+def _edit(content, rng, edits, edit_size):
+    content = bytearray(content)
+    for _ in range(edits):
+        position = rng.randrange(len(content))
+        patch = rng.randbytes(rng.randint(1, edit_size))
+        if rng.random() < 0.5:
+            content[position:position] = patch
+        else:
+            content[position:position + len(patch)] = patch
+    return bytes(content)
+
+
+class Command(BaseCommand):
+    help = "Compares full-copy and delta version storage on a synthetic, incrementally edited document."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=400 * 1024, help="Initial plaintext size in bytes.")
+        parser.add_argument('--revisions', type=int, default=40)
+        parser.add_argument('--edits', type=int, default=3, help="Edits per revision.")
+        parser.add_argument('--edit-size', type=int, default=200)
+        parser.add_argument('--keyframe-interval', type=int, default=settings.DOCUMENTS_DELTA_KEYFRAME_INTERVAL)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        dek = generate_dek()
+        interval = options['keyframe_interval']
+
+        words = [rng.randbytes(rng.randint(2, 9)).hex().encode() for _ in range(2000)]
+        content = b' '.join(rng.choice(words) for _ in range(options['size'] // 10))[:options['size']]
+
+        # Each entry is (ciphertext, depth); depth 0 is a keyframe.
+        stored = []
+        fulls = []
+        full_bytes = delta_bytes = 0
+        encode_time = 0.0
+
+        for revision in range(options['revisions'] + 1):
+            if revision:
+                previous = content
+                content = _edit(content, rng, options['edits'], options['edit_size'])
+
+            full = _encrypt(content, dek)
+            fulls.append(full)
+            full_bytes += len(full)
+
+            depth = stored[-1][1] + 1 if stored else 0
+            if stored and depth < interval:
+                started = time.perf_counter()
+                delta = make_delta(previous, content)
+                encode_time += time.perf_counter() - started
+                stored.append((_encrypt(delta, dek), depth))
+            else:
+                stored.append((full, 0))
+            delta_bytes += len(stored[-1][0])
+
+        latencies = []
+        full_latencies = []
+        for index, (_, depth) in enumerate(stored):
+            started = time.perf_counter()
+            data = _decrypt(stored[index - depth][0], dek)
+            for step in range(index - depth + 1, index + 1):
+                data = apply_delta(data, _decrypt(stored[step][0], dek))
+            latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            _decrypt(fulls[index], dek)
+            full_latencies.append(time.perf_counter() - started)
+
+        versions = len(stored)
+        self.stdout.write(f"Versions: {versions}, keyframe interval: {interval}")
+        self.stdout.write(f"Full copies: {full_bytes} bytes")
+        self.stdout.write(
+            f"Delta storage: {delta_bytes} bytes "
+            f"({100 * (1 - delta_bytes / full_bytes):.1f}% saved)"
+        )
+        self.stdout.write(f"Delta encoding: {1000 * encode_time / max(versions - 1, 1):.2f} ms per version")
+        self.stdout.write(
+            f"Reconstruction: avg {1000 * sum(latencies) / versions:.2f} ms, "
+            f"max {1000 * max(latencies):.2f} ms "
+            f"(full copy avg {1000 * sum(full_latencies) / versions:.2f} ms)"
+        )
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from documents.models import DownloadLink
+
+
+class Command(BaseCommand):
+    help = "Deletes expired DownloadLink rows in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.0, help="Pause between batches, in seconds.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now()
+        expired = DownloadLink.objects.filter(expires_at__lt=cutoff).order_by('expires_at')
+        purged = 0
+
+        while True:
+            batch = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+
+            deleted, _ = DownloadLink.objects.filter(pk__in=batch).delete()
+            purged += deleted
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(f"Purged {purged} expired download links")
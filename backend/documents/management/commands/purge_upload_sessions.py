@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from documents.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = "Deletes expired upload sessions together with their stored parts."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            deleted, counts = UploadSession.objects.filter(expires_at__lt=timezone.now()).delete()
+
+        sessions = counts.get('documents.UploadSession', 0)
+        parts = counts.get('documents.UploadPart', 0)
+        self.stdout.write(f"Purged {sessions} upload sessions and {parts} parts")
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_documentversion_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentversion',
+            name='encryption_format',
+            field=models.CharField(choices=[('fernet', 'Fernet (whole file)'), ('segmented', 'Segmented AES-GCM stream')], default='fernet', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='documentversion',
+            name='encryption_format',
+            field=models.CharField(choices=[('fernet', 'Fernet (whole file)'), ('segmented', 'Segmented AES-GCM stream')], default='segmented', max_length=10),
+        ),
+    ]
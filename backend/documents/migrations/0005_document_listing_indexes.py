@@ -0,0 +1,27 @@
+# Generated by Django 5.2.11 on 2026-10-18 12:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_documentversion_encryption_format'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['owner', '-updated_at', '-id'], name='documents_d_owner_i_001fec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['-updated_at', '-id'], name='documents_d_updated_d3fd30_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentaccess',
+            index=models.Index(fields=['user', 'document'], name='documents_d_user_id_853020_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+# The share view and ShareDocumentSerializer both logged every grant, so
+# identical SHARE rows written moments apart describe a single event.
+DUPLICATE_WINDOW = timedelta(seconds=5)
+
+
+def backfill_share_events(apps, schema_editor):
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    Document = apps.get_model('documents', 'Document')
+    ShareEvent = apps.get_model('documents', 'ShareEvent')
+    User = apps.get_model('users', 'User')
+
+    document_ids = set(Document.objects.values_list('id', flat=True))
+    user_ids = {str(pk) for pk in User.objects.values_list('id', flat=True)}
+
+    shares = (
+        AuditLog.objects.filter(action='SHARE', target_type='Document')
+        .order_by('timestamp')
+        .values_list('user_id', 'target_id', 'new_data', 'timestamp')
+    )
+
+    last_seen = {}
+    batch = []
+    for from_user_id, document_id, new_data, timestamp in shares.iterator(chunk_size=BATCH_SIZE):
+        to_user_id = (new_data or {}).get('shared_with')
+        if document_id not in document_ids or str(to_user_id) not in user_ids:
+            continue
+
+        role = (new_data or {}).get('role') or 'viewer'
+        key = (from_user_id, document_id, str(to_user_id), role)
+        previous = last_seen.get(key)
+        last_seen[key] = timestamp
+        if previous is not None and timestamp - previous <= DUPLICATE_WINDOW:
+            continue
+
+        batch.append(ShareEvent(
+            document_id=document_id,
+            from_user_id=from_user_id,
+            to_user_id=to_user_id,
+            role=role,
+            timestamp=timestamp
+        ))
+        if len(batch) >= BATCH_SIZE:
+            ShareEvent.objects.bulk_create(batch)
+            batch = []
+
+    ShareEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_shareevent'),
+        ('audit', '0005_partition_auditlog_by_month'),
+        ('users', '0003_pooledkeypair'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_share_events, migrations.RunPython.noop),
+    ]
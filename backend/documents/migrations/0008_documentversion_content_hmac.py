@@ -0,0 +1,28 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_backfill_shareevents'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentversion',
+            name='content_hmac',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='documentversion',
+            index=models.Index(fields=['document', 'content_hmac'], name='documents_d_documen_0871dc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentversion',
+            index=models.Index(fields=['file'], name='documents_d_file_cbdc2f_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.11 on 2026-10-18 14:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_documentversion_content_hmac'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentversion',
+            name='base_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='deltas', to='documents.documentversion'),
+        ),
+        migrations.AddField(
+            model_name='documentversion',
+            name='chain_depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='documentversion',
+            name='storage_kind',
+            field=models.CharField(choices=[('full', 'Full copy'), ('delta', 'Delta against base version')], default='full', max_length=10),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0009_documentversion_delta_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentversion',
+            name='codec',
+            field=models.CharField(default='none', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='documentversion',
+            name='plaintext_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
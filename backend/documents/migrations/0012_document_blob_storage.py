@@ -0,0 +1,24 @@
+# Generated by Django 5.2.11 on 2026-10-18 16:30
+
+import documents.utils.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0011_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentversion',
+            name='file',
+            field=models.FileField(storage=documents.utils.storage.get_document_storage, upload_to='documents/'),
+        ),
+        migrations.AlterField(
+            model_name='uploadpart',
+            name='file',
+            field=models.FileField(storage=documents.utils.storage.get_document_storage, upload_to='uploads/'),
+        ),
+    ]
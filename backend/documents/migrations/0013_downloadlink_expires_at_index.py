@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0012_document_blob_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='downloadlink',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
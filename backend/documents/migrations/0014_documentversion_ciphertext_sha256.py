@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0013_downloadlink_expires_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentversion',
+            name='ciphertext_sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
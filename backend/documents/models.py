@@ -3,7 +3,8 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
-from config.constants import STATUS_CHOICES
+from documents.utils.storage import get_document_storage
+from config.constants import STATUS_CHOICES, ENCRYPTION_FORMAT_CHOICES, STORAGE_KIND_CHOICES
 
 class Document(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -16,6 +17,12 @@ class Document(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)    
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-updated_at', '-id']),
+            models.Index(fields=['-updated_at', '-id']),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.owner.email})"
 
@@ -29,9 +36,24 @@ class DocumentVersion(models.Model):
         on_delete=models.CASCADE
     )
 
-    file = models.FileField(upload_to='documents/')
+    file = models.FileField(upload_to='documents/', storage=get_document_storage)
     version_number = models.PositiveIntegerField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='approved')
+    encryption_format = models.CharField(max_length=10, choices=ENCRYPTION_FORMAT_CHOICES, default='segmented')
+    codec = models.CharField(max_length=20, default='none')
+    plaintext_size = models.BigIntegerField(null=True, blank=True)
+    content_hmac = models.CharField(max_length=64, blank=True)
+    ciphertext_sha256 = models.CharField(max_length=64, blank=True)
+
+    storage_kind = models.CharField(max_length=10, choices=STORAGE_KIND_CHOICES, default='full')
+    base_version = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.RESTRICT,
+        related_name='deltas'
+    )
+    chain_depth = models.PositiveSmallIntegerField(default=0)
 
     uploaded_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -43,9 +65,21 @@ class DocumentVersion(models.Model):
     class Meta:
         ordering = ['-version_number']
         unique_together = ('document', 'version_number')
+        indexes = [
+            models.Index(fields=['document', 'content_hmac']),
+            models.Index(fields=['file']),
+        ]
 
     def __str__(self):
         return f"{self.document.title} v{self.version_number}"
+
+    # Strong validator: the stored ciphertext is immutable per version.
+    # Versions uploaded before the digest was recorded fall back to the id.
+    @property
+    def etag(self):
+        if self.ciphertext_sha256:
+            return f'"{self.id}.{self.ciphertext_sha256[:32]}"'
+        return f'"{self.id}"'
     
 
 class DownloadLink(models.Model):
@@ -58,7 +92,7 @@ class DownloadLink(models.Model):
     )
 
     token = models.UUIDField(default=uuid.uuid4, unique=True)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
 
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -94,3 +128,99 @@ class DocumentAccess(models.Model):
 
     class Meta:
         unique_together = ('document', 'user')
+        indexes = [
+            models.Index(fields=['user', 'document']),
+        ]
+
+
+class ShareEvent(models.Model):
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.CASCADE,
+        related_name='share_events'
+    )
+
+    from_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='shares_sent'
+    )
+
+    to_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='shares_received'
+    )
+
+    role = models.CharField(max_length=10, choices=DocumentAccess.ROLE_CHOICES)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['document', 'timestamp']),
+        ]
+
+
+# Resumable upload of a new version in numbered parts. Parts are sealed
+# with the session's segment salt as they arrive and are concatenated
+# into the version file on commit.
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    salt = models.BinaryField()
+
+    version = models.OneToOneField(
+        DocumentVersion,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='upload_session'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    @property
+    def part_count(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    def part_size(self, number):
+        if number < self.part_count:
+            return self.chunk_size
+        return self.total_size - (self.part_count - 1) * self.chunk_size
+
+    def is_expired(self):
+        return timezone.now() > self.expires_at
+
+
+class UploadPart(models.Model):
+    session = models.ForeignKey(
+        UploadSession,
+        on_delete=models.CASCADE,
+        related_name='parts'
+    )
+
+    number = models.PositiveIntegerField()
+    file = models.FileField(upload_to='uploads/', storage=get_document_storage)
+    size = models.BigIntegerField()
+    content_hmac = models.CharField(max_length=64)
+
+    uploaded_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('session', 'number')
@@ -0,0 +1,5 @@
+from config.pagination import KeysetPagination
+
+
+class DocumentPagination(KeysetPagination):
+    ordering = ('-updated_at', '-id')
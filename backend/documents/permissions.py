@@ -1,25 +1,19 @@
 from rest_framework.permissions import BasePermission
-from .models import DocumentAccess
+from .utils.access import get_document_access
 
 
 class IsOwnerOrHasAccess(BasePermission):
     def has_object_permission(self, request, view, obj): # type: ignore
-        if obj.owner == request.user:
+        if obj.owner_id == request.user.pk:
             return True
 
-        return DocumentAccess.objects.filter(
-            document=obj,
-            user=request.user
-        ).exists()
+        return get_document_access(request, obj) is not None
 
 
 class CanEditDocument(BasePermission):
     def has_object_permission(self, request, view, obj): # type: ignore
-        if obj.owner == request.user:
+        if obj.owner_id == request.user.pk:
             return True
 
-        return DocumentAccess.objects.filter(
-            document=obj,
-            user=request.user,
-            role='editor'
-        ).exists()
+        access = get_document_access(request, obj)
+        return access is not None and access.role == 'editor'
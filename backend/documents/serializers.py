@@ -1,9 +1,15 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from rest_framework import serializers
-from .models import Document, DocumentVersion, DocumentAccess, DownloadLink
+from django.conf import settings
+from .models import Document, DocumentVersion, DocumentAccess, DownloadLink, ShareEvent, UploadSession
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
-from .utils.crypto import generate_dek, encrypt_file, encrypt_dek_for_user, decrypt_dek_for_user
-from audit.utils.audit import log_action
+from django.db import transaction
+from .utils.crypto import generate_dek, encrypt_dek_for_user, SEGMENT_SIZE, SEGMENT_SALT_SIZE
+from .utils.dek import unwrap_document_dek, invalidate_document_dek
+from .utils.uploads import session_expiry
+from .utils.versions import store_version
+from audit.utils.audit import log_action, log_actions
 from config.constants import AuditAction
 from audit.utils.request import get_client_ip
 
@@ -41,16 +47,7 @@ class DocumentCreateSerializer(serializers.ModelSerializer):
         document = Document.objects.create(owner=user, **validated_data)
         
         dek = generate_dek()
-        file_bytes = file.read()
-        encrypted_bytes = encrypt_file(file_bytes, dek)
-        encrypted_file = ContentFile(encrypted_bytes, name=file.name)
-
-        DocumentVersion.objects.create(
-            document=document,
-            file=encrypted_file,
-            version_number=1,
-            uploaded_by=user
-        )
+        store_version(document, user, file, dek, name=file.name, version_number=1)
 
         encrypted_dek = encrypt_dek_for_user(
             dek, 
@@ -90,11 +87,22 @@ class DocumentVersionSerializer(serializers.ModelSerializer):
             'version_number',
             'file',
             'status',
+            'storage_kind',
+            'base_version',
+            'codec',
+            'plaintext_size',
             'uploaded_by',
             'uploaded_by_email',
             'uploaded_at'
         ]
-        read_only_fields = ['version_number', 'uploaded_by']
+        read_only_fields = [
+            'version_number',
+            'storage_kind',
+            'base_version',
+            'codec',
+            'plaintext_size',
+            'uploaded_by'
+        ]
 
 
 class DocumentVersionCreateSerializer(serializers.ModelSerializer):
@@ -148,10 +156,7 @@ class ShareDocumentSerializer(serializers.Serializer):
         if owner_access.encrypted_dek is None:
             raise serializers.ValidationError("DEK для владельца отсутствует!")
 
-        dek = decrypt_dek_for_user(
-            owner_access.encrypted_dek,
-            owner.private_key.encode()
-        )
+        dek = unwrap_document_dek(owner_access, owner)
 
         encrypted_dek = encrypt_dek_for_user(dek, new_user.public_key.encode()) # type: ignore
 
@@ -161,6 +166,13 @@ class ShareDocumentSerializer(serializers.Serializer):
             defaults={'role': validated_data['role'], 'encrypted_dek': encrypted_dek}
         )
 
+        ShareEvent.objects.create(
+            document=document,
+            from_user=owner,
+            to_user=new_user,
+            role=validated_data['role']
+        )
+
         log_action(
             user=owner,
             action=AuditAction.SHARE,
@@ -177,9 +189,150 @@ class ShareDocumentSerializer(serializers.Serializer):
         return access
     
 
+class ShareRecipientSerializer(serializers.Serializer):
+    user_id = serializers.UUIDField()
+    role = serializers.ChoiceField(choices=DocumentAccess.ROLE_CHOICES)
+
+
+class BulkShareDocumentSerializer(serializers.Serializer):
+    shares = ShareRecipientSerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate(self, attrs):
+        document = self.context['document']
+        request_user = self.context['request'].user
+
+        if document.owner != request_user:
+            raise serializers.ValidationError("Only owner can share document.")
+
+        roles = {share['user_id']: share['role'] for share in attrs['shares']}
+        users = User.objects.in_bulk(list(roles.keys()))
+
+        missing = [str(user_id) for user_id in roles if user_id not in users]
+        if missing:
+            raise serializers.ValidationError({"shares": f"Unknown users: {', '.join(missing)}"})
+
+        attrs['recipients'] = [(users[user_id], role) for user_id, role in roles.items()]
+        return attrs
+
+    def create(self, validated_data):
+        document = self.context['document']
+        owner = document.owner
+        recipients = validated_data['recipients']
+
+        owner_access = DocumentAccess.objects.get(document=document, user=owner)
+
+        if owner_access.encrypted_dek is None:
+            raise serializers.ValidationError("DEK для владельца отсутствует!")
+
+        dek = unwrap_document_dek(owner_access, owner)
+
+        # The upsert only ever raises a role: sharing with someone who is
+        # already an editor (the owner included) as viewer keeps editor.
+        current = dict(
+            DocumentAccess.objects.filter(document=document, user__in=[user for user, _ in recipients])
+            .values_list('user_id', 'role')
+        )
+        recipients = [
+            (user, 'editor' if 'editor' in (role, current.get(user.id)) else role)
+            for user, role in recipients
+        ]
+
+        with ThreadPoolExecutor(max_workers=settings.DOCUMENTS_SHARE_WORKERS) as executor:
+            wrapped = list(executor.map(
+                lambda user: encrypt_dek_for_user(dek, user.public_key.encode()),
+                [user for user, _ in recipients]
+            ))
+
+        # Grants, share events and audit rows land together or not at all.
+        with transaction.atomic():
+            accesses = DocumentAccess.objects.bulk_create(
+                [
+                    DocumentAccess(document=document, user=user, role=role, encrypted_dek=encrypted_dek)
+                    for (user, role), encrypted_dek in zip(recipients, wrapped)
+                ],
+                update_conflicts=True,
+                unique_fields=['document', 'user'],
+                update_fields=['role', 'encrypted_dek']
+            )
+
+            ShareEvent.objects.bulk_create([
+                ShareEvent(document=document, from_user=owner, to_user=user, role=role)
+                for user, role in recipients
+            ])
+
+            ip_address = get_client_ip(self.context['request'])
+            log_actions([
+                {
+                    "user": owner,
+                    "action": AuditAction.SHARE,
+                    "target_type": "Document",
+                    "target_id": document.id,
+                    "old_data": None,
+                    "new_data": {
+                        "shared_with": str(user.id),
+                        "role": role
+                    },
+                    "ip_address": ip_address
+                }
+                for user, role in recipients
+            ])
+
+        for user, _ in recipients:
+            invalidate_document_dek(user.id, document.id)
+
+        return accesses
+
+
 class DownloadLinkSerializer(serializers.ModelSerializer):
     class Meta:
         model = DownloadLink
         fields = ['id', 'token', 'expires_at', 'created_at']
         read_only_fields = ['token', 'created_at']
 
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.IntegerField(required=False)
+    part_count = serializers.IntegerField(read_only=True)
+    received_parts = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id',
+            'filename',
+            'total_size',
+            'chunk_size',
+            'part_count',
+            'received_parts',
+            'version',
+            'expires_at',
+            'created_at'
+        ]
+        read_only_fields = ['version', 'expires_at', 'created_at']
+
+    def get_received_parts(self, obj):
+        return sorted(part.number for part in obj.parts.all())
+
+    def validate_total_size(self, value):
+        if value < 0:
+            raise serializers.ValidationError("total_size must not be negative.")
+        return value
+
+    def validate_chunk_size(self, value):
+        if value <= 0 or value % SEGMENT_SIZE:
+            raise serializers.ValidationError(f"chunk_size must be a positive multiple of {SEGMENT_SIZE} bytes.")
+        if value > settings.DOCUMENTS_UPLOAD_MAX_CHUNK_SIZE:
+            raise serializers.ValidationError(f"chunk_size must not exceed {settings.DOCUMENTS_UPLOAD_MAX_CHUNK_SIZE} bytes.")
+        return value
+
+    def create(self, validated_data):
+        validated_data.setdefault('chunk_size', settings.DOCUMENTS_UPLOAD_CHUNK_SIZE)
+
+        return UploadSession.objects.create(
+            document=self.context['document'],
+            created_by=self.context['request'].user,
+            salt=os.urandom(SEGMENT_SALT_SIZE),
+            expires_at=session_expiry(),
+            **validated_data
+        )
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .models import DocumentAccess, DocumentVersion, UploadPart
+from .utils.dek import invalidate_document_dek
+from .utils.keys import invalidate_user_keys
+from .utils.storage import reset_document_storage
+from .utils.versions import release_blob
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def drop_cached_user_keys(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'public_key', 'private_key'} & set(update_fields):
+        invalidate_user_keys(instance.pk)
+
+
+@receiver(post_save, sender=DocumentAccess)
+@receiver(post_delete, sender=DocumentAccess)
+def drop_cached_dek(sender, instance, **kwargs):
+    invalidate_document_dek(instance.user_id, instance.document_id)
+
+
+# Versions with identical content share one ciphertext object, so the blob
+# is only removed once the last version pointing at it is gone.
+@receiver(post_delete, sender=DocumentVersion)
+def release_version_blob(sender, instance, **kwargs):
+    release_blob(instance)
+
+
+@receiver(post_delete, sender=UploadPart)
+def delete_part_blob(sender, instance, **kwargs):
+    storage, name = instance.file.storage, instance.file.name
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(setting_changed)
+def drop_document_storage(sender, setting, **kwargs):
+    if setting == 'STORAGES':
+        reset_document_storage()
@@ -1,3 +1,901 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from cryptography.exceptions import InvalidTag
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.backends.utils import CursorWrapper
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from audit.models import AuditLog
+from documents.models import Document, DocumentAccess, DownloadLink, UploadPart, UploadSession
+from documents.utils.cache import TTLCache
+from documents.utils.crypto import (
+    SEGMENT_HEADER_SIZE,
+    SEGMENT_SIZE,
+    SEGMENT_TAG_SIZE,
+    decrypt_dek_for_user,
+    decrypt_stream,
+    encrypt_stream,
+    generate_dek,
+    segmented_plaintext_size
+)
+from documents.utils.dek import dek_cache, unwrap_document_dek
+from documents.utils.http import RangeNotSatisfiable, parse_range
+from documents.utils.keys import load_private_key, private_key_cache
+from documents.utils.parallel import SegmentEngine
+from documents.utils.plaintext import PlaintextReader
+from documents.utils.storage import InMemoryS3Storage
+from documents.utils.versions import store_version
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+# Shared fixture for the API tests: an owner, a client authenticated as
+# them and helpers that upload through the API.
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DocumentAPITestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'pass', full_name='Owner')
+
+    def setUp(self):
+        self.client = self.client_for(self.owner)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def upload(self, content, title='document', filename='document.bin', content_type='application/octet-stream'):
+        self.client.post('/api/documents/', {
+            'title': title,
+            'file': SimpleUploadedFile(filename, content, content_type=content_type)
+        }, format='multipart')
+        return Document.objects.filter(title=title).latest('created_at')
+
+    def upload_version(self, document, content, filename='document.bin'):
+        return self.client.post(f'/api/documents/{document.id}/upload_version/', {
+            'file': SimpleUploadedFile(filename, content)
+        }, format='multipart')
+
+
+class SegmentedEncryptionTests(SimpleTestCase):
+    def setUp(self):
+        self.dek = generate_dek()
+
+    def encrypt(self, data):
+        return b''.join(encrypt_stream([data[i:i + 1000] for i in range(0, len(data), 1000)], self.dek))
+
+    def decrypt(self, ciphertext):
+        return b''.join(decrypt_stream(io.BytesIO(ciphertext), self.dek, len(ciphertext)))
+
+    def test_round_trip(self):
+        for size in [0, 1, SEGMENT_SIZE - 1, SEGMENT_SIZE, SEGMENT_SIZE * 2 + 7]:
+            with self.subTest(size=size):
+                data = os.urandom(size)
+                ciphertext = self.encrypt(data)
+                self.assertEqual(segmented_plaintext_size(len(ciphertext)), size)
+                self.assertEqual(self.decrypt(ciphertext), data)
+
+    def test_truncation_is_rejected(self):
+        ciphertext = self.encrypt(os.urandom(SEGMENT_SIZE * 2 + 7))
+        truncated = ciphertext[:SEGMENT_HEADER_SIZE + 2 * (SEGMENT_SIZE + SEGMENT_TAG_SIZE)]
+        with self.assertRaises(InvalidTag):
+            self.decrypt(truncated)
+
+    def test_reordering_is_rejected(self):
+        ciphertext = self.encrypt(os.urandom(SEGMENT_SIZE * 2 + 7))
+        stride = SEGMENT_SIZE + SEGMENT_TAG_SIZE
+        first = ciphertext[SEGMENT_HEADER_SIZE:SEGMENT_HEADER_SIZE + stride]
+        second = ciphertext[SEGMENT_HEADER_SIZE + stride:SEGMENT_HEADER_SIZE + 2 * stride]
+        swapped = ciphertext[:SEGMENT_HEADER_SIZE] + second + first + ciphertext[SEGMENT_HEADER_SIZE + 2 * stride:]
+        with self.assertRaises(InvalidTag):
+            self.decrypt(swapped)
+
+    def test_header_and_key_are_authenticated(self):
+        ciphertext = bytearray(self.encrypt(b'payload'))
+        ciphertext[10] ^= 1
+        with self.assertRaises(InvalidTag):
+            self.decrypt(bytes(ciphertext))
+
+        ciphertext = self.encrypt(b'payload')
+        self.dek = generate_dek()
+        with self.assertRaises(InvalidTag):
+            self.decrypt(ciphertext)
+
+
+class RangeParsingTests(SimpleTestCase):
+    def test_parse_range(self):
+        cases = [
+            (None, 100, None),
+            ('bytes=0-9', 100, (0, 10)),
+            ('bytes=0-0', 100, (0, 1)),
+            ('bytes=90-', 100, (90, 100)),
+            ('bytes=95-200', 100, (95, 100)),
+            ('bytes=-10', 100, (90, 100)),
+            ('bytes=-200', 100, (0, 100)),
+            ('bytes=-', 100, None),
+            ('items=0-9', 100, None),
+            ('bytes=0-1,5-6', 100, None),
+        ]
+        for header, size, expected in cases:
+            with self.subTest(header=header, size=size):
+                self.assertEqual(parse_range(header, size), expected)
+
+    def test_unsatisfiable_ranges(self):
+        for header, size in [('bytes=100-', 100), ('bytes=5-2', 100), ('bytes=-0', 100), ('bytes=-5', 0), ('bytes=0-', 0)]:
+            with self.subTest(header=header, size=size), self.assertRaises(RangeNotSatisfiable):
+                parse_range(header, size)
+
+
+class RangeRequestTests(DocumentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.urandom(SEGMENT_SIZE * 2 + 500)
+        self.url = f'/api/documents/{self.upload(self.content).id}/decrypt/'
+
+    def test_range_spanning_segments(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={SEGMENT_SIZE - 5}-{SEGMENT_SIZE + 4}')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes {SEGMENT_SIZE - 5}-{SEGMENT_SIZE + 4}/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[SEGMENT_SIZE - 5:SEGMENT_SIZE + 5])
+
+    def test_stale_if_range_gets_full_body(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_unsatisfiable_range_returns_416(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+
+class DownloadServeModeTests(DocumentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        document = self.upload(b'served ' * 100)
+        self.version = document.versions.get()
+        token = self.client.post(f'/api/documents/{document.id}/create_download_link/').data['token']
+        self.url = f'/api/documents/download/{token}/'
+
+    def test_sendfile_streams_ciphertext_with_ranges(self):
+        with self.version.file.open('rb') as f:
+            ciphertext = f.read()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), ciphertext)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), ciphertext[10:20])
+
+    @override_settings(DOCUMENTS_DOWNLOAD_SERVE_MODE='x-accel-redirect', DOCUMENTS_X_ACCEL_REDIRECT_PREFIX='/internal/')
+    def test_x_accel_redirect_hands_off_to_nginx(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/internal/' + self.version.file.name)
+        self.assertEqual(response.content, b'')
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    @override_settings(DOCUMENTS_DOWNLOAD_SERVE_MODE='x-sendfile')
+    def test_x_sendfile_hands_off_to_apache(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.version.file.path)
+        self.assertEqual(response.content, b'')
+
+
+class TTLCacheTests(SimpleTestCase):
+    def test_expired_entries_are_dropped_on_write(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        with mock.patch('documents.utils.cache.time.monotonic', return_value=1000):
+            cache.set('old', 'private key')
+
+        with mock.patch('documents.utils.cache.time.monotonic', return_value=1061):
+            cache.set('new', 'private key')
+            self.assertEqual(cache.stats()['size'], 1)
+            self.assertIsNone(cache.get('old'))
+            self.assertEqual(cache.get('new'), 'private key')
+
+    def test_lru_eviction_and_discard(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set(('u1', 'a'), 1)
+        cache.set(('u1', 'b'), 2)
+        cache.get(('u1', 'a'))
+        cache.set(('u2', 'c'), 3)
+        self.assertIsNone(cache.get(('u1', 'b')))
+
+        cache.discard(lambda key: key[0] == 'u1')
+        self.assertIsNone(cache.get(('u1', 'a')))
+        self.assertEqual(cache.get(('u2', 'c')), 3)
+
+
+class PrivateKeyCacheTests(DocumentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        private_key_cache.clear()
+
+    def test_parsed_key_is_reused_until_the_key_changes(self):
+        pem = self.owner.private_key.encode()
+        key = load_private_key(pem, self.owner.pk)
+        self.assertIs(load_private_key(pem, self.owner.pk), key)
+
+        self.owner.private_key = User.objects.create_user('other@example.com', 'pass', full_name='Other').private_key
+        self.owner.save(update_fields=['private_key'])
+        self.assertEqual(private_key_cache.stats()['size'], 0)
+        self.assertIsNot(load_private_key(pem, self.owner.pk), key)
+
+
+class DekCacheTests(DocumentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.upload(b'payload')
+        self.access = DocumentAccess.objects.get()
+        dek_cache.clear()
+
+        patcher = mock.patch.object(dek_cache, 'maxsize', 16)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(dek_cache.clear)
+
+    def unwrap_counting(self):
+        with mock.patch('documents.utils.dek.decrypt_dek_for_user', wraps=decrypt_dek_for_user) as rsa:
+            dek = unwrap_document_dek(self.access, self.owner)
+        return dek, rsa.call_count
+
+    def test_repeated_unwraps_skip_rsa(self):
+        dek, calls = self.unwrap_counting()
+        self.assertEqual(calls, 1)
+        self.assertEqual(self.unwrap_counting(), (dek, 0))
+
+    def test_access_changes_invalidate_the_entry(self):
+        self.unwrap_counting()
+        self.access.save()
+        self.assertEqual(self.unwrap_counting()[1], 1)
+
+    def test_disabled_cache_always_unwraps(self):
+        with mock.patch.object(dek_cache, 'maxsize', 0):
+            self.unwrap_counting()
+            self.assertEqual(self.unwrap_counting()[1], 1)
+
+
+class BulkShareTests(DocumentAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipients = [
+            User.objects.create_user(f'bulk{number}@example.com', 'pass', full_name=f'Recipient {number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.document = self.upload(b'payload')
+        self.url = f'/api/documents/{self.document.id}/share_bulk/'
+
+    def share(self, shares):
+        return self.client.post(self.url, {
+            'shares': [{'user_id': str(user.id), 'role': role} for user, role in shares]
+        }, format='json')
+
+    def role_of(self, user):
+        return DocumentAccess.objects.get(document=self.document, user=user).role
+
+    def test_grants_every_recipient_with_one_unwrap(self):
+        with mock.patch('documents.utils.dek.decrypt_dek_for_user', wraps=decrypt_dek_for_user) as rsa:
+            response = self.share([(user, 'viewer') for user in self.recipients])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(rsa.call_count, 1)
+
+        owner_dek = unwrap_document_dek(self.document.access_list.get(user=self.owner), self.owner)
+        for user in self.recipients:
+            self.assertEqual(unwrap_document_dek(self.document.access_list.get(user=user), user), owner_dek)
+        self.assertEqual(self.document.share_events.count(), 3)
+        self.assertEqual(AuditLog.objects.filter(action='SHARE', target_id=self.document.id).count(), 3)
+
+    def test_failed_audit_rolls_back_the_grants(self):
+        with mock.patch('documents.serializers.log_actions', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            self.share([(user, 'viewer') for user in self.recipients])
+
+        self.assertFalse(DocumentAccess.objects.filter(user__in=self.recipients).exists())
+        self.assertFalse(self.document.share_events.exists())
+
+    def test_upsert_never_downgrades_a_role(self):
+        first, second, _ = self.recipients
+        self.share([(first, 'editor'), (second, 'viewer')])
+
+        self.share([(first, 'viewer'), (second, 'editor'), (self.owner, 'viewer')])
+        self.assertEqual(self.role_of(first), 'editor')
+        self.assertEqual(self.role_of(second), 'editor')
+        self.assertEqual(self.role_of(self.owner), 'editor')
+
+    def test_rejects_unknown_users_and_non_owners(self):
+        response = self.client.post(self.url, {
+            'shares': [{'user_id': '00000000-0000-0000-0000-000000000000', 'role': 'viewer'}]
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        DocumentAccess.objects.create(document=self.document, user=self.recipients[0], role='editor')
+        response = self.client_for(self.recipients[0]).post(self.url, {
+            'shares': [{'user_id': str(self.recipients[1].id), 'role': 'viewer'}]
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Needs row locks")
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class BlobReleaseConcurrencyTests(TransactionTestCase):
+    def test_dedupe_waits_for_a_pending_release(self):
+        owner = User.objects.create_user('release@example.com', 'pass', full_name='Owner')
+        document = Document.objects.create(owner=owner, title='shared blob')
+        dek = generate_dek()
+        first = store_version(document, owner, ContentFile(b'same body', name='a.txt'), dek, name='a.txt', version_number=1)
+
+        deleted, release = threading.Event(), threading.Event()
+        stored = []
+
+        def delete_first():
+            with transaction.atomic():
+                first.delete()
+                deleted.set()
+                release.wait(10)
+            connection.close()
+
+        def store_again():
+            stored.append(store_version(
+                document, owner, ContentFile(b'same body', name='b.txt'), dek, name='b.txt', version_number=2
+            ))
+            connection.close()
+
+        deleter = threading.Thread(target=delete_first)
+        deleter.start()
+        deleted.wait(10)
+        uploader = threading.Thread(target=store_again)
+        uploader.start()
+        time.sleep(0.5)
+        release.set()
+        deleter.join()
+        uploader.join()
+
+        version = stored[0]
+        self.assertNotEqual(version.file.name, first.file.name)
+        self.assertTrue(version.file.storage.exists(version.file.name))
+        self.assertFalse(first.file.storage.exists(first.file.name))
+
+
+class DocumentAccessQueryTests(DocumentAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.viewer = User.objects.create_user('viewer@example.com', 'pass', full_name='Viewer')
+        cls.stranger = User.objects.create_user('stranger@example.com', 'pass', full_name='Stranger')
+
+    def setUp(self):
+        super().setUp()
+        self.content = b'confidential ' * 1000
+        self.document = self.upload(self.content)
+        self.client.post(
+            f'/api/documents/{self.document.id}/share/',
+            {'user_id': str(self.viewer.id), 'role': 'viewer'},
+            format='json'
+        )
+
+    def test_my_dek_loads_access_once(self):
+        client = self.client_for(self.viewer)
+        with self.assertNumQueries(2):
+            response = client.get(f'/api/documents/{self.document.id}/my_dek/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_decrypt_loads_access_once(self):
+        client = self.client_for(self.viewer)
+        with self.assertNumQueries(3):
+            response = client.get(f'/api/documents/{self.document.id}/decrypt/')
+            body = b''.join(response.streaming_content)
+        self.assertEqual(body, self.content)
+
+    def test_owner_decrypt_does_not_load_owner(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/documents/{self.document.id}/decrypt/')
+            b''.join(response.streaming_content)
+
+    def test_viewer_cannot_upload_version(self):
+        self.client = self.client_for(self.viewer)
+        self.assertEqual(self.upload_version(self.document, b'changed').status_code, 403)
+
+    def test_stranger_gets_404(self):
+        client = self.client_for(self.stranger)
+        response = client.get(f'/api/documents/{self.document.id}/decrypt/')
+        self.assertEqual(response.status_code, 404)
+
+
+class DocumentListingTests(DocumentAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.reader = User.objects.create_user('reader@example.com', 'pass', full_name='Reader')
+        cls.documents = [
+            Document.objects.create(owner=cls.owner, title=f'doc-{index}')
+            for index in range(5)
+        ]
+        for document in cls.documents[:3]:
+            DocumentAccess.objects.create(document=document, user=cls.reader, role='viewer')
+
+    def test_keyset_pages_cover_all_documents_once(self):
+        titles = []
+        url = '/api/documents/?page_size=2'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            titles += [item['title'] for item in response.data['results']]
+            url = response.data['next']
+
+        expected = Document.objects.order_by('-updated_at', '-id').values_list('title', flat=True)
+        self.assertEqual(titles, list(expected))
+
+    def test_shared_documents_are_listed_without_duplicates(self):
+        response = self.client_for(self.reader).get('/api/documents/')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response.data['results'][0]['owner_email'], self.owner.email)
+
+
+class VersionDeduplicationTests(DocumentAPITestCase):
+    def test_identical_upload_reuses_ciphertext(self):
+        document = self.upload(b'same bytes')
+        self.assertEqual(self.upload_version(document, b'same bytes').status_code, 201)
+        self.assertEqual(self.upload_version(document, b'other bytes').status_code, 201)
+
+        first, second, third = document.versions.order_by('version_number')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertNotEqual(first.file.name, third.file.name)
+
+        other = self.upload(b'same bytes')
+        self.assertNotEqual(other.versions.get().content_hmac, first.content_hmac)
+
+    def test_shared_blob_survives_until_last_reference(self):
+        document = self.upload(b'same bytes')
+        self.upload_version(document, b'same bytes')
+        first, second = document.versions.order_by('version_number')
+        storage, name = first.file.storage, first.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(storage.exists(name))
+
+
+@override_settings(DOCUMENTS_DELTA_ENABLED=True, DOCUMENTS_DELTA_KEYFRAME_INTERVAL=3)
+class DeltaVersionTests(DocumentAPITestCase):
+    def test_versions_are_stored_as_deltas_between_keyframes(self):
+        revisions = [b''.join(b'clause %d;' % i for i in range(20000))]
+        for number in range(4):
+            content = bytearray(revisions[-1])
+            content[number * 40000:number * 40000] = b'amended %d' % number
+            revisions.append(bytes(content))
+
+        document = self.upload(revisions[0])
+        for content in revisions[1:]:
+            self.upload_version(document, content)
+
+        versions = list(document.versions.order_by('version_number'))
+        self.assertEqual(
+            [version.storage_kind for version in versions],
+            ['full', 'delta', 'delta', 'full', 'delta']
+        )
+        self.assertEqual(versions[2].base_version, versions[1])
+        self.assertLess(versions[2].file.size, versions[0].file.size // 10)
+
+        response = self.client.get(f'/api/documents/{document.id}/decrypt/')
+        self.assertEqual(b''.join(response.streaming_content), revisions[-1])
+
+        dek = unwrap_document_dek(document.access_list.get(user=self.owner), self.owner)
+        for version, content in zip(versions, revisions):
+            self.assertEqual(PlaintextReader(version, dek).read(), content)
+
+        document.delete()
+        self.assertFalse(Document.objects.exists())
+
+    def test_large_base_is_not_loaded_for_a_delta(self):
+        document = self.upload(b'x' * 4096)
+
+        with override_settings(DOCUMENTS_DELTA_MAX_SIZE=2048), \
+                mock.patch('documents.utils.versions.PlaintextReader') as reader:
+            self.upload_version(document, b'y' * 1024)
+        reader.assert_not_called()
+        self.assertEqual(document.versions.first().storage_kind, 'full')
+
+
+@override_settings(DOCUMENTS_COMPRESSION_CODEC='zlib')
+class CompressionTests(DocumentAPITestCase):
+    def test_text_is_compressed_and_ranges_decrypt(self):
+        content = b''.join(b'line %d of the export\n' % i for i in range(20000))
+        document = self.upload(content, 'export.csv', 'export.csv', 'text/csv')
+
+        version = document.versions.get()
+        self.assertEqual(version.codec, 'zlib')
+        self.assertEqual(version.plaintext_size, len(content))
+        self.assertLess(version.file.size, len(content) // 3)
+
+        response = self.client.get(f'/api/documents/{document.id}/decrypt/')
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+        response = self.client.get(f'/api/documents/{document.id}/decrypt/', HTTP_RANGE='bytes=100000-200000')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), content[100000:200001])
+
+    def test_compressed_types_and_random_data_are_stored_as_is(self):
+        image = self.upload(b'\x89PNG' + b'\x00' * 5000, 'scan.png', 'scan.png', 'image/png')
+        pdf = self.upload(b'%PDF-1.7 ' + b'0' * 5000, 'report.pdf', 'report.pdf', 'application/pdf')
+        noise = self.upload(os.urandom(5000), 'blob.bin', 'blob.bin')
+
+        self.assertEqual(image.versions.get().codec, 'none')
+        self.assertEqual(pdf.versions.get().codec, 'none')
+        self.assertEqual(noise.versions.get().codec, 'none')
+
+
+class UploadSessionTests(DocumentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.document = self.upload(b'first version')
+        self.base = f'/api/documents/{self.document.id}/upload_sessions/'
+
+    def put_part(self, session_id, number, data):
+        return self.client.put(
+            f'{self.base}{session_id}/parts/{number}/',
+            data,
+            content_type='application/octet-stream'
+        )
+
+    def test_parts_are_assembled_on_commit(self):
+        content = os.urandom(SEGMENT_SIZE * 5 + 123)
+        response = self.client.post(self.base, {
+            'filename': 'video.bin',
+            'total_size': len(content),
+            'chunk_size': SEGMENT_SIZE * 2
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        session_id = response.data['id']
+        self.assertEqual(response.data['part_count'], 3)
+
+        chunk = SEGMENT_SIZE * 2
+        self.assertEqual(self.put_part(session_id, 3, content[2 * chunk:]).status_code, 200)
+        self.assertEqual(self.put_part(session_id, 1, content[:chunk]).status_code, 200)
+        self.assertEqual(self.put_part(session_id, 1, content[:chunk]).status_code, 200)
+        self.assertEqual(self.put_part(session_id, 1, content[chunk:2 * chunk]).status_code, 409)
+        self.assertEqual(self.put_part(session_id, 2, content[chunk:2 * chunk - 1]).status_code, 400)
+
+        response = self.client.post(f'{self.base}{session_id}/commit/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['missing'], [2])
+
+        self.put_part(session_id, 2, content[chunk:2 * chunk])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'{self.base}{session_id}/commit/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['version_number'], 2)
+        self.assertFalse(UploadPart.objects.exists())
+        self.assertEqual(len(os.listdir(os.path.join(MEDIA_ROOT, 'uploads'))), 0)
+
+        response = self.client.post(f'{self.base}{session_id}/commit/')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(f'/api/documents/{self.document.id}/decrypt/')
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+    def test_expired_sessions_are_purged(self):
+        response = self.client.post(self.base, {'filename': 'empty.bin', 'total_size': 0}, format='json')
+        session_id = response.data['id']
+        self.assertEqual(self.put_part(session_id, 1, b'').status_code, 200)
+
+        UploadSession.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.put_part(session_id, 1, b'').status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('purge_upload_sessions', stdout=io.StringIO())
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(UploadPart.objects.exists())
+
+
+S3_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'documents': {
+        'BACKEND': 'documents.utils.storage.InMemoryS3Storage',
+        'OPTIONS': {'part_size': SEGMENT_SIZE, 'workers': 3, 'min_part_size': SEGMENT_SIZE},
+    },
+}
+
+
+@override_settings(STORAGES=S3_STORAGES, DOCUMENTS_COMPRESSION_CODEC='none')
+class BlobStorageTests(DocumentAPITestCase):
+    def test_upload_decrypt_and_download_go_through_blob_storage(self):
+        content = os.urandom(SEGMENT_SIZE * 4 + 1000)
+        document = self.upload(content)
+        version = document.versions.get()
+
+        storage = version.file.storage
+        self.assertIsInstance(storage, InMemoryS3Storage)
+        ciphertext = storage.open(version.file.name).read()
+        self.assertEqual(len(ciphertext), version.file.size)
+
+        response = self.client.get(
+            f'/api/documents/{document.id}/decrypt/',
+            HTTP_RANGE=f'bytes={SEGMENT_SIZE * 3 - 10}-{SEGMENT_SIZE * 3 + 10}'
+        )
+        self.assertEqual(b''.join(response.streaming_content), content[SEGMENT_SIZE * 3 - 10:SEGMENT_SIZE * 3 + 11])
+
+        token = self.client.post(f'/api/documents/{document.id}/create_download_link/').data['token']
+        response = self.client.get(f'/api/documents/download/{token}/', HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), ciphertext[100:200])
+
+    def test_version_listings_render_without_urls(self):
+        document = self.upload(b'first version')
+        base = f'/api/documents/{document.id}/upload_sessions/'
+
+        content = os.urandom(SEGMENT_SIZE + 10)
+        session_id = self.client.post(base, {
+            'filename': 'archive.bin',
+            'total_size': len(content),
+            'chunk_size': SEGMENT_SIZE * 2
+        }, format='json').data['id']
+        self.client.put(f'{base}{session_id}/parts/1/', content, content_type='application/octet-stream')
+
+        response = self.client.post(f'{base}{session_id}/commit/')
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.data['file'])
+
+        response = self.client.get(f'/api/documents/{document.id}/versions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([version['file'] for version in response.data], [None, None])
+
+    def test_proxy_serve_modes_stream_blobs_without_a_local_path(self):
+        document = self.upload(b'remote blob')
+        version = document.versions.get()
+        ciphertext = version.file.storage.open(version.file.name).read()
+        token = self.client.post(f'/api/documents/{document.id}/create_download_link/').data['token']
+
+        for mode in ('x-sendfile', 'x-accel-redirect'):
+            with self.subTest(mode=mode), override_settings(DOCUMENTS_DOWNLOAD_SERVE_MODE=mode):
+                response = self.client.get(f'/api/documents/download/{token}/')
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('X-Sendfile', response)
+                self.assertNotIn('X-Accel-Redirect', response)
+                self.assertEqual(b''.join(response.streaming_content), ciphertext)
+
+    def test_small_parts_are_rejected_like_s3(self):
+        storage = InMemoryS3Storage(part_size=10, min_part_size=100)
+        with self.assertRaises(ValueError):
+            storage.save('blob', ContentFile(b'x' * 25))
+        self.assertFalse(storage.exists('blob'))
+
+
+class AsyncViewTests(DocumentAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.stranger = User.objects.create_user('stranger@example.com', 'pass', full_name='Stranger')
+
+    def setUp(self):
+        super().setUp()
+        self.content = os.urandom(SEGMENT_SIZE * 3)
+        self.document = self.upload(self.content)
+        self.token = self.client.post(f'/api/documents/{self.document.id}/create_download_link/').data['token']
+
+    def auth(self, user):
+        return {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    async def read(self, response):
+        return b''.join([chunk async for chunk in response.streaming_content])
+
+    async def test_decrypt_streams_plaintext_range(self):
+        response = await self.async_client.get(
+            f'/api/documents/async/{self.document.id}/decrypt/',
+            headers={'Range': 'bytes=1000-99999', **self.auth(self.owner)}
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(await self.read(response), self.content[1000:100000])
+
+    async def test_decrypt_requires_access(self):
+        url = f'/api/documents/async/{self.document.id}/decrypt/'
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+        self.assertEqual((await self.async_client.get(url, headers=self.auth(self.stranger))).status_code, 404)
+
+    async def test_download_streams_ciphertext(self):
+        response = await self.async_client.get(
+            f'/api/documents/async/download/{self.token}/',
+            headers=self.auth(self.owner)
+        )
+        self.assertEqual(response.status_code, 200)
+
+        version = await self.document.versions.afirst()
+        ciphertext = await sync_to_async(lambda: version.file.open('rb').read())()
+        self.assertEqual(await self.read(response), ciphertext)
+
+    @override_settings(DOCUMENTS_DELTA_ENABLED=True)
+    async def test_decrypt_streams_delta_without_queries_in_the_pool(self):
+        content = self.content[:5000] + b'amended' + self.content[5000:]
+
+        await sync_to_async(self.upload_version)(self.document, content)
+        version = await self.document.versions.afirst()
+        self.assertEqual(version.storage_kind, 'delta')
+
+        threads = []
+        execute = CursorWrapper.execute
+
+        def record(cursor, *args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return execute(cursor, *args, **kwargs)
+
+        with mock.patch.object(CursorWrapper, 'execute', record):
+            response = await self.async_client.get(
+                f'/api/documents/async/{self.document.id}/decrypt/',
+                headers=self.auth(self.owner)
+            )
+            self.assertEqual(await self.read(response), content)
+        self.assertTrue(threads)
+        self.assertFalse([name for name in threads if name.startswith('documents-crypto')])
+
+    async def test_download_requires_authentication(self):
+        url = f'/api/documents/async/download/{self.token}/'
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(await AuditLog.objects.filter(action='DOWNLOAD').aexists())
+
+    async def test_download_returns_304_before_audit(self):
+        url = f'/api/documents/async/download/{self.token}/'
+        etag = (await self.async_client.get(url, headers=self.auth(self.owner)))['ETag']
+        logged = await AuditLog.objects.filter(action='DOWNLOAD').acount()
+
+        response = await self.async_client.get(url, headers={'If-None-Match': etag, **self.auth(self.owner)})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(await AuditLog.objects.filter(action='DOWNLOAD').acount(), logged)
+
+
+class DownloadLinkTests(DocumentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.document = self.upload(b'payload')
+
+    def create_link(self):
+        return self.client.post(f'/api/documents/{self.document.id}/create_download_link/').data['token']
+
+    @override_settings(DOCUMENTS_SIGNED_DOWNLOAD_LINKS=True)
+    def test_signed_link_is_validated_without_a_row(self):
+        token = self.create_link()
+        self.assertFalse(DownloadLink.objects.exists())
+
+        # Version lookup plus the audit insert.
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/documents/download/{token}/')
+        self.assertEqual(response.status_code, 200)
+
+        tampered = token[:-2] + ('AA' if not token.endswith('AA') else 'BB')
+        self.assertEqual(self.client.get(f'/api/documents/download/{tampered}/').status_code, 404)
+
+    @override_settings(DOCUMENTS_SIGNED_DOWNLOAD_LINKS=True, DOCUMENTS_DOWNLOAD_LINK_TTL=-1)
+    def test_expired_signed_link_is_rejected(self):
+        token = self.create_link()
+        self.assertEqual(self.client.get(f'/api/documents/download/{token}/').status_code, 400)
+
+    def test_stored_link_is_loaded_with_its_version(self):
+        token = self.create_link()
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/documents/download/{token}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_purge_removes_only_expired_links(self):
+        self.create_link()
+        self.create_link()
+        DownloadLink.objects.filter(pk=DownloadLink.objects.first().pk).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        call_command('purge_download_links', batch_size=1, stdout=io.StringIO())
+        self.assertEqual(DownloadLink.objects.count(), 1)
+        self.assertFalse(DownloadLink.objects.filter(expires_at__lt=timezone.now()).exists())
+
+
+class ConditionalRequestTests(DocumentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.document = self.upload(b'cached body')
+        self.version = self.document.versions.get()
+
+    def test_version_etag_includes_ciphertext_digest(self):
+        with self.version.file.open('rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        self.assertEqual(self.version.ciphertext_sha256, digest)
+        self.assertEqual(self.version.etag, f'"{self.version.id}.{digest[:32]}"')
+
+    def test_decrypt_returns_304_before_crypto(self):
+        url = f'/api/documents/{self.document.id}/decrypt/'
+        etag = self.client.get(url)['ETag']
+
+        with mock.patch('documents.views.unwrap_document_dek') as unwrap, \
+                mock.patch('documents.views.PlaintextReader') as reader:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        unwrap.assert_not_called()
+        reader.assert_not_called()
+
+        since = response['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+
+    def test_download_returns_304(self):
+        token = self.client.post(f'/api/documents/{self.document.id}/create_download_link/').data['token']
+        url = f'/api/documents/download/{token}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    @override_settings(DOCUMENTS_DOWNLOAD_SERVE_MODE='x-accel-redirect')
+    def test_offloaded_download_sends_validators(self):
+        token = self.client.post(f'/api/documents/{self.document.id}/create_download_link/').data['token']
+        response = self.client.get(f'/api/documents/download/{token}/')
+        self.assertEqual(response['ETag'], self.version.etag)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('X-Accel-Redirect', response)
+
+    def test_listing_etags_change_with_content(self):
+        url = f'/api/documents/{self.document.id}/versions/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.upload_version(self.document, b'new body')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get('/api/documents/')['ETag']
+        self.assertEqual(self.client.get('/api/documents/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.patch(f'/api/documents/{self.document.id}/', {'title': 'renamed'}, format='json')
+        self.assertEqual(self.client.get('/api/documents/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SegmentEngineTests(TestCase):
+    def test_parallel_engine_matches_serial_output(self):
+        dek = generate_dek()
+        data = os.urandom(SEGMENT_SIZE * 5 + 123)
+        engine = SegmentEngine('thread', workers=3, batch_segments=1)
+        self.addCleanup(engine.shutdown)
+
+        with mock.patch('documents.utils.crypto.segment_engine', engine):
+            ciphertext = b''.join(encrypt_stream([data], dek))
+            plaintext = b''.join(decrypt_stream(io.BytesIO(ciphertext), dek, len(ciphertext)))
+            ranged = b''.join(decrypt_stream(
+                io.BytesIO(ciphertext), dek, len(ciphertext), SEGMENT_SIZE - 10, SEGMENT_SIZE * 3 + 10
+            ))
+        self.assertEqual(plaintext, data)
+        self.assertEqual(ranged, data[SEGMENT_SIZE - 10:SEGMENT_SIZE * 3 + 10])
+
+        serial = b''.join(decrypt_stream(io.BytesIO(ciphertext), dek, len(ciphertext)))
+        self.assertEqual(serial, data)
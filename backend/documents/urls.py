@@ -1,7 +1,14 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import DocumentViewSet
 
 router = DefaultRouter()
 router.register(r'', DocumentViewSet, basename='documents')
 
-urlpatterns = router.urls
+# Async variants of download/decrypt for ASGI deployments; they must sit
+# before the router so 'async' is not taken for a document id.
+urlpatterns = [
+    path('async/download/<str:token>/', async_views.download, name='documents-async-download'),
+    path('async/<uuid:pk>/decrypt/', async_views.decrypt, name='documents-async-decrypt'),
+] + router.urls
@@ -0,0 +1,27 @@
+from documents.models import DocumentAccess
+
+ACCESS_CACHE_ATTR = '_document_access'
+
+
+def _access_cache(request):
+    # DRF wraps the Django request; keep the map on the underlying
+    # HttpRequest so permissions and views share one per request.
+    http_request = getattr(request, '_request', request)
+    cache = getattr(http_request, ACCESS_CACHE_ATTR, None)
+    if cache is None:
+        cache = {}
+        setattr(http_request, ACCESS_CACHE_ATTR, cache)
+    return cache
+
+
+def get_document_access(request, document):
+    cache = _access_cache(request)
+
+    if document.pk not in cache:
+        cache[document.pk] = DocumentAccess.objects.filter(
+            document_id=document.pk,
+            user_id=request.user.pk
+        ).first()
+
+    return cache[document.pk]
+
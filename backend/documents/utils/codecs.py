@@ -0,0 +1,143 @@
+import fnmatch
+from abc import ABC, abstractmethod
+import lzma
+import mimetypes
+import zlib
+
+from django.conf import settings
+
+# Plaintext is compressed before it is encrypted, since ciphertext does
+# not compress. Codecs are looked up by the name stored on the version,
+# so a registered name must keep decoding the same way forever.
+COMPRESSION_SAMPLE_SIZE = 64 * 1024
+
+
+# compressor()/decompressor() return fresh zlib/lzma-style objects:
+# compress()/flush() and decompress() (flush() optional).
+class Codec(ABC):
+    name = None
+
+    @abstractmethod
+    def compressor(self):
+        pass
+
+    @abstractmethod
+    def decompressor(self):
+        pass
+
+
+class _Passthrough:
+    def compress(self, data):
+        return data
+
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+class IdentityCodec(Codec):
+    name = 'none'
+
+    def compressor(self):
+        return _Passthrough()
+
+    def decompressor(self):
+        return _Passthrough()
+
+
+class ZlibCodec(Codec):
+    name = 'zlib'
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def compressor(self):
+        return zlib.compressobj(self.level)
+
+    def decompressor(self):
+        return zlib.decompressobj()
+
+
+class LzmaCodec(Codec):
+    name = 'lzma'
+
+    def __init__(self, preset=6):
+        self.preset = preset
+
+    def compressor(self):
+        return lzma.LZMACompressor(preset=self.preset)
+
+    def decompressor(self):
+        return lzma.LZMADecompressor()
+
+
+codecs = {}
+
+
+def register_codec(codec):
+    codecs[codec.name] = codec
+
+
+def get_codec(name):
+    try:
+        return codecs[name]
+    except KeyError:
+        raise ValueError(f"Unknown compression codec: {name}")
+
+
+register_codec(IdentityCodec())
+register_codec(ZlibCodec())
+register_codec(LzmaCodec())
+
+
+def compress_stream(chunks, name):
+    if name == IdentityCodec.name:
+        yield from chunks
+        return
+
+    compressor = get_codec(name).compressor()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def decompress_stream(chunks, name):
+    if name == IdentityCodec.name:
+        yield from chunks
+        return
+
+    decompressor = get_codec(name).decompressor()
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    if hasattr(decompressor, 'flush'):
+        yield decompressor.flush()
+
+
+def _skipped_type(file, name):
+    content_type = getattr(file, 'content_type', None) or mimetypes.guess_type(name)[0] or ''
+    return any(fnmatch.fnmatch(content_type, pattern) for pattern in settings.DOCUMENTS_COMPRESSION_SKIP_TYPES)
+
+
+# Already-compressed MIME types are stored as is, and so is anything whose
+# first COMPRESSION_SAMPLE_SIZE bytes do not shrink below MIN_RATIO.
+def choose_codec(file, name):
+    codec = settings.DOCUMENTS_COMPRESSION_CODEC
+    if codec == IdentityCodec.name or _skipped_type(file, name):
+        return IdentityCodec.name
+
+    file.seek(0)
+    sample = file.read(COMPRESSION_SAMPLE_SIZE)
+    file.seek(0)
+    if not sample:
+        return IdentityCodec.name
+
+    compressed = b''.join(compress_stream([sample], codec))
+    if len(compressed) > len(sample) * settings.DOCUMENTS_COMPRESSION_MIN_RATIO:
+        return IdentityCodec.name
+    return codec
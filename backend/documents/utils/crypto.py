@@ -1,6 +1,29 @@
+import base64
+import hashlib
+import hmac
+import os
+import struct
+
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from django.core.files.base import File
+
+from .codecs import compress_stream
+from .keys import load_private_key
+from .parallel import segment_engine
+
+# Segmented format: header (magic, segment size, salt) followed by
+# AES-GCM sealed segments. Each segment is bound to its index and to
+# whether it is the last one, so reordering and truncation are detected.
+SEGMENT_MAGIC = b'SDS1'
+SEGMENT_SIZE = 64 * 1024
+SEGMENT_SALT_SIZE = 16
+SEGMENT_TAG_SIZE = 16
+SEGMENT_HEADER_SIZE = len(SEGMENT_MAGIC) + 4 + SEGMENT_SALT_SIZE
+
 
 def generate_dek() -> bytes:
     return Fernet.generate_key()
@@ -13,6 +36,171 @@ def decrypt_file(encrypted_bytes: bytes, dek: bytes) -> bytes:
     f = Fernet(dek)
     return f.decrypt(encrypted_bytes)
 
+
+class SegmentCipher:
+    def __init__(self, dek: bytes, salt: bytes | None = None, segment_size: int = SEGMENT_SIZE):
+        self.salt = salt or os.urandom(SEGMENT_SALT_SIZE)
+        self.segment_size = segment_size
+        self.header = segment_header(self.salt, segment_size)
+
+        key = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=self.salt,
+            info=b'documents-segment-v1',
+        ).derive(base64.urlsafe_b64decode(dek))
+        self._aead = AESGCM(key)
+
+    @classmethod
+    def from_header(cls, dek: bytes, header: bytes) -> 'SegmentCipher':
+        return cls(dek, salt=header[8:], segment_size=parse_segment_header(header))
+
+    def _nonce(self, index: int, final: bool) -> bytes:
+        return b'\x00' * 7 + struct.pack('>I', index) + (b'\x01' if final else b'\x00')
+
+    def seal(self, index: int, data: bytes, final: bool) -> bytes:
+        return self._aead.encrypt(self._nonce(index, final), data, self.header)
+
+    def open(self, index: int, data: bytes, final: bool) -> bytes:
+        return self._aead.decrypt(self._nonce(index, final), data, self.header)
+
+
+def segment_header(salt: bytes, segment_size: int = SEGMENT_SIZE) -> bytes:
+    return SEGMENT_MAGIC + struct.pack('>I', segment_size) + salt
+
+def parse_segment_header(header: bytes) -> int:
+    if len(header) != SEGMENT_HEADER_SIZE or not header.startswith(SEGMENT_MAGIC):
+        raise ValueError("Invalid segmented ciphertext header")
+    return struct.unpack('>I', header[4:8])[0]
+
+def segmented_plaintext_size(ciphertext_size: int, segment_size: int = SEGMENT_SIZE) -> int:
+    body = ciphertext_size - SEGMENT_HEADER_SIZE
+    count = segment_count(ciphertext_size, segment_size)
+    return body - count * SEGMENT_TAG_SIZE
+
+def segment_count(ciphertext_size: int, segment_size: int = SEGMENT_SIZE) -> int:
+    body = ciphertext_size - SEGMENT_HEADER_SIZE
+    stride = segment_size + SEGMENT_TAG_SIZE
+    return max(1, -(-body // stride))
+
+
+# Batch workers for the segment engine. They rebuild the cipher from the
+# header instead of receiving it, so they also work in process pools.
+def seal_batch(dek: bytes, header: bytes, batch):
+    cipher = SegmentCipher.from_header(dek, header)
+    return [cipher.seal(index, data, final) for index, data, final in batch]
+
+def open_batch(dek: bytes, header: bytes, batch):
+    cipher = SegmentCipher.from_header(dek, header)
+    return [cipher.open(index, data, final) for index, data, final in batch]
+
+
+def _plain_segments(chunks, segment_size: int):
+    buffer = bytearray()
+    index = 0
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) > segment_size:
+            yield index, bytes(buffer[:segment_size]), False
+            del buffer[:segment_size]
+            index += 1
+
+    yield index, bytes(buffer), True
+
+def encrypt_stream(chunks, dek: bytes, segment_size: int = SEGMENT_SIZE):
+    header = segment_header(os.urandom(SEGMENT_SALT_SIZE), segment_size)
+    yield header
+    yield from segment_engine.run(seal_batch, dek, header, _plain_segments(chunks, segment_size))
+
+# Seals consecutive segments starting at first_index, for ciphertext that
+# is produced out of order (upload parts). The caller writes the header.
+def seal_segments(dek: bytes, header: bytes, blocks, first_index: int, last_index: int):
+    tasks = (
+        (index, block, index == last_index)
+        for index, block in enumerate(blocks, start=first_index)
+    )
+    return segment_engine.run(seal_batch, dek, header, tasks)
+
+def decrypt_stream(fileobj, dek: bytes, ciphertext_size: int, start: int = 0, stop: int | None = None):
+    header = fileobj.read(SEGMENT_HEADER_SIZE)
+    size = parse_segment_header(header)
+    stride = size + SEGMENT_TAG_SIZE
+    last = segment_count(ciphertext_size, size) - 1
+
+    if stop is None:
+        stop = segmented_plaintext_size(ciphertext_size, size)
+    if start >= stop:
+        return
+
+    first = start // size
+    end = min(last, (stop - 1) // size)
+    if first:
+        fileobj.seek(SEGMENT_HEADER_SIZE + first * stride)
+
+    tasks = (
+        (index, fileobj.read(stride), index == last)
+        for index in range(first, end + 1)
+    )
+    for index, plain in enumerate(segment_engine.run(open_batch, dek, header, tasks), start=first):
+        yield plain[max(start - index * size, 0):stop - index * size]
+
+
+# Keyed with the document's DEK, so equal digests only reveal equality
+# between versions of the same document.
+def content_mac_key(dek: bytes) -> bytes:
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b'documents-dedup-v1',
+    ).derive(base64.urlsafe_b64decode(dek))
+
+def content_mac(dek: bytes):
+    return hmac.new(content_mac_key(dek), digestmod=hashlib.sha256)
+
+
+# Storage backends pull ciphertext from chunks(), so the upload is
+# compressed and encrypted segment by segment while it is written out.
+# The plaintext HMAC, plaintext size and ciphertext digest are available
+# once the stream is exhausted.
+class EncryptedUpload(File):
+    def __init__(self, file, dek: bytes, name=None, codec='none'):
+        super().__init__(file, name=name or getattr(file, 'name', None))
+        self.dek = dek
+        self.codec = codec
+        self.content_hmac = None
+        self.plaintext_size = None
+        self.ciphertext_sha256 = None
+
+    @property
+    def size(self): # type: ignore
+        if self.codec != 'none':
+            return None
+        plain = self.file.size
+        count = max(1, -(-plain // SEGMENT_SIZE))
+        return SEGMENT_HEADER_SIZE + plain + count * SEGMENT_TAG_SIZE
+
+    def chunks(self, chunk_size=None):
+        digest = hashlib.sha256()
+        for chunk in encrypt_stream(compress_stream(self._plaintext(), self.codec), self.dek):
+            digest.update(chunk)
+            yield chunk
+        self.ciphertext_sha256 = digest.hexdigest()
+
+    def _plaintext(self):
+        mac = content_mac(self.dek)
+        size = 0
+        for chunk in self.file.chunks():
+            mac.update(chunk)
+            size += len(chunk)
+            yield chunk
+        self.content_hmac = mac.hexdigest()
+        self.plaintext_size = size
+
+    def multiple_chunks(self, chunk_size=None):
+        return True
+
+
 def encrypt_dek_for_user(dek: bytes, public_key_pem: bytes) -> bytes:
     public_key = serialization.load_pem_public_key(public_key_pem)
     encrypted_dek = public_key.encrypt( # type: ignore
@@ -25,11 +213,11 @@ def encrypt_dek_for_user(dek: bytes, public_key_pem: bytes) -> bytes:
     )
     return encrypted_dek
 
-def decrypt_dek_for_user(encrypted_dek: bytes, private_key_pem: bytes) -> bytes:
+def decrypt_dek_for_user(encrypted_dek: bytes, private_key_pem: bytes, user_id=None) -> bytes:
     if isinstance(encrypted_dek, memoryview):
         encrypted_dek = bytes(encrypted_dek)
-        
-    private_key = serialization.load_pem_private_key(private_key_pem, password=None)
+
+    private_key = load_private_key(private_key_pem, user_id)
     dek = private_key.decrypt( # type: ignore
         encrypted_dek,
         padding.OAEP(
@@ -0,0 +1,49 @@
+import hashlib
+
+from django.conf import settings
+
+from .cache import TTLCache
+from .crypto import decrypt_dek_for_user
+
+# Unwrapped DEKs, keyed by (user id, document id, digest of the wrapped DEK).
+# The digest ties an entry to the DocumentAccess row it came from, so a
+# re-shared or revoked row can never be served from another worker's cache.
+dek_cache = TTLCache(
+    maxsize=settings.DOCUMENTS_DEK_CACHE_SIZE if settings.DOCUMENTS_DEK_CACHE_ENABLED else 0,
+    ttl=settings.DOCUMENTS_DEK_CACHE_TTL
+)
+
+
+def unwrap_document_dek(access, user) -> bytes:
+    encrypted_dek = bytes(access.encrypted_dek)
+    cache_key = (str(user.pk), str(access.document_id), hashlib.sha256(encrypted_dek).hexdigest())
+
+    dek = dek_cache.get(cache_key)
+    if dek is None:
+        try:
+            dek = decrypt_dek_for_user(encrypted_dek, user.private_key.encode(), user_id=user.pk)
+        except ValueError:
+            # Not re-wrapped yet by a running key rotation.
+            if not user.previous_private_key:
+                raise
+            dek = decrypt_dek_for_user(encrypted_dek, user.previous_private_key.encode(), user_id=user.pk)
+        dek_cache.set(cache_key, dek)
+
+    return dek
+
+
+def invalidate_document_dek(user_id, document_id):
+    user_id, document_id = str(user_id), str(document_id)
+    dek_cache.discard(lambda key: key[0] == user_id and key[1] == document_id)
+
+
+def dek_cache_stats():
+    stats = dek_cache.stats()
+    stats["enabled"] = settings.DOCUMENTS_DEK_CACHE_ENABLED
+    stats["rsa_operations_saved"] = stats["hits"]
+    return stats
+
+
+def invalidate_user_deks(user_id):
+    user_id = str(user_id)
+    dek_cache.discard(lambda key: key[0] == user_id)
@@ -0,0 +1,92 @@
+import hashlib
+import struct
+
+# Delta payload: magic, base size, then a sequence of COPY (offset and
+# length into the base) and INSERT (literal bytes) operations. Payloads
+# are produced before encryption and stored like any other version.
+DELTA_MAGIC = b'SDD1'
+OP_COPY = b'C'
+OP_INSERT = b'I'
+
+# Content-defined chunk boundaries (gear rolling hash), so an insertion
+# only changes the chunks around it instead of shifting every block.
+CHUNK_MIN = 2 * 1024
+CHUNK_MAX = 64 * 1024
+CHUNK_MASK = 0x1FFF << 51
+HASH_MASK = (1 << 64) - 1
+GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], 'big') for i in range(256)]
+
+
+def chunk_boundaries(data: bytes):
+    start = 0
+    size = len(data)
+
+    while start < size:
+        end = min(start + CHUNK_MAX, size)
+        position = start + CHUNK_MIN
+        h = 0
+        while position < end:
+            h = ((h << 1) + GEAR[data[position]]) & HASH_MASK
+            position += 1
+            if not h & CHUNK_MASK:
+                break
+        stop = min(position, end)
+        yield start, stop
+        start = stop
+
+
+def make_delta(base: bytes, target: bytes) -> bytes:
+    index = {}
+    for start, stop in chunk_boundaries(base):
+        index.setdefault(hashlib.sha1(base[start:stop]).digest(), start)
+
+    ops = []
+    for start, stop in chunk_boundaries(target):
+        chunk = target[start:stop]
+        offset = index.get(hashlib.sha1(chunk).digest())
+
+        if offset is not None and base[offset:offset + len(chunk)] == chunk:
+            last = ops[-1] if ops else None
+            if last and last[0] == OP_COPY and last[1] + last[2] == offset:
+                last[2] += len(chunk)
+            else:
+                ops.append([OP_COPY, offset, len(chunk)])
+        elif ops and ops[-1][0] == OP_INSERT:
+            ops[-1][1] += chunk
+        else:
+            ops.append([OP_INSERT, bytearray(chunk)])
+
+    parts = [DELTA_MAGIC, struct.pack('>Q', len(base))]
+    for op in ops:
+        if op[0] == OP_COPY:
+            parts.append(OP_COPY + struct.pack('>QI', op[1], op[2]))
+        else:
+            parts.append(OP_INSERT + struct.pack('>I', len(op[1])))
+            parts.append(bytes(op[1]))
+    return b''.join(parts)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    if not delta.startswith(DELTA_MAGIC):
+        raise ValueError("Invalid delta payload")
+
+    base_size = struct.unpack_from('>Q', delta, 4)[0]
+    if base_size != len(base):
+        raise ValueError("Delta does not match its base version")
+
+    out = []
+    position = 12
+    while position < len(delta):
+        op = delta[position:position + 1]
+        if op == OP_COPY:
+            offset, length = struct.unpack_from('>QI', delta, position + 1)
+            out.append(base[offset:offset + length])
+            position += 13
+        elif op == OP_INSERT:
+            length = struct.unpack_from('>I', delta, position + 1)[0]
+            out.append(delta[position + 5:position + 5 + length])
+            position += 5 + length
+        else:
+            raise ValueError("Invalid delta operation")
+
+    return b''.join(out)
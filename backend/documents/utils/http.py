@@ -0,0 +1,183 @@
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from .storage import open_blob_range
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+# Returns a half-open (start, stop) tuple, or None to serve the full body.
+# Multi-range requests get the full body, which RFC 9110 allows.
+def parse_range(header, size):
+    if not header:
+        return None
+
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size
+
+    start = int(first)
+    stop = min(int(last) + 1, size) if last else size
+    if start >= size or start >= stop:
+        raise RangeNotSatisfiable()
+    return start, stop
+
+
+def if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+
+    if if_range.startswith('"'):
+        return if_range == etag
+
+    since = parse_http_date_safe(if_range)
+    return since is not None and last_modified is not None and int(last_modified.timestamp()) <= since
+
+
+def requested_range(request, size, etag, last_modified):
+    if not if_range_matches(request, etag, last_modified):
+        return None
+    return parse_range(request.META.get('HTTP_RANGE'), size)
+
+
+# Answers If-None-Match / If-Modified-Since (and the If-Match family) from
+# the validators alone; returns None when the full response is needed.
+def conditional_response(request, etag, last_modified=None):
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+# Validator for a list response, built from per-item stamps that change
+# whenever an item's representation does.
+def listing_etag(stamps):
+    digest = hashlib.sha256()
+    for stamp in stamps:
+        digest.update(stamp.encode())
+        digest.update(b'\n')
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+
+
+def range_not_satisfiable(size):
+    response = HttpResponse(status=416)
+    response['Content-Range'] = f'bytes */{size}'
+    return response
+
+
+def ranged_streaming_response(request, stream_factory, size, filename, etag=None, last_modified=None):
+    try:
+        byte_range = requested_range(request, size, etag, last_modified)
+    except RangeNotSatisfiable:
+        return range_not_satisfiable(size)
+
+    start, stop = byte_range or (0, size)
+    filename = os.path.basename(filename)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    response = StreamingHttpResponse(
+        stream_factory(start, stop),
+        status=206 if byte_range else 200,
+        content_type=content_type
+    )
+    response['Content-Length'] = str(stop - start)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+    set_validators(response, etag, last_modified)
+    return response
+
+
+# The proxy passes these headers through, so clients still get the
+# validators they need for conditional requests.
+def _accel_response(header, value, filename, etag=None, last_modified=None):
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = HttpResponse(content_type=content_type)
+    response[header] = value
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+def _local_path(fieldfile):
+    try:
+        return fieldfile.path
+    except NotImplementedError:
+        return None
+
+
+# In the proxy modes nginx/Apache do the transfer and answer Range
+# requests themselves, so only the redirect and validator headers are
+# produced here. They read the blob from disk, so blobs in storages
+# without a local path are streamed by Django instead.
+def file_response(request, fieldfile, etag=None, last_modified=None):
+    path = _local_path(fieldfile)
+    mode = settings.DOCUMENTS_DOWNLOAD_SERVE_MODE if path is not None else 'sendfile'
+    filename = os.path.basename(fieldfile.name)
+
+    if mode == 'x-accel-redirect':
+        return _accel_response(
+            'X-Accel-Redirect',
+            settings.DOCUMENTS_X_ACCEL_REDIRECT_PREFIX + fieldfile.name,
+            filename,
+            etag,
+            last_modified
+        )
+    if mode == 'x-sendfile':
+        return _accel_response('X-Sendfile', path, filename, etag, last_modified)
+
+    size = fieldfile.size
+    try:
+        byte_range = requested_range(request, size, etag, last_modified)
+    except RangeNotSatisfiable:
+        return range_not_satisfiable(size)
+
+    start, stop = byte_range or (0, size)
+    response = FileResponse(
+        open_blob_range(fieldfile, start, stop),
+        as_attachment=True,
+        filename=filename,
+        status=206 if byte_range else 200
+    )
+    response['Content-Length'] = str(stop - start)
+    response['Accept-Ranges'] = 'bytes'
+
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+    set_validators(response, etag, last_modified)
+    return response
@@ -0,0 +1,28 @@
+import hashlib
+
+from django.conf import settings
+from cryptography.hazmat.primitives import serialization
+
+from .cache import TTLCache
+
+# Parsed private key objects, keyed by (user id, PEM fingerprint).
+private_key_cache = TTLCache(
+    maxsize=settings.DOCUMENTS_PRIVATE_KEY_CACHE_SIZE,
+    ttl=settings.DOCUMENTS_PRIVATE_KEY_CACHE_TTL
+)
+
+
+def load_private_key(private_key_pem: bytes, user_id=None):
+    cache_key = (str(user_id), hashlib.sha256(private_key_pem).hexdigest())
+
+    private_key = private_key_cache.get(cache_key)
+    if private_key is None:
+        private_key = serialization.load_pem_private_key(private_key_pem, password=None)
+        private_key_cache.set(cache_key, private_key)
+
+    return private_key
+
+
+def invalidate_user_keys(user_id):
+    user_id = str(user_id)
+    private_key_cache.discard(lambda key: key[0] == user_id)
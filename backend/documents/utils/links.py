@@ -0,0 +1,74 @@
+import uuid
+
+from django.core import signing
+from django.utils import timezone
+
+from documents.models import DocumentVersion, DownloadLink
+
+SIGNING_SALT = 'documents.download-link'
+
+
+class DownloadLinkExpired(Exception):
+    pass
+
+
+# Signed tokens carry the version, creator and expiry themselves, so no
+# DownloadLink row is written and validating one needs no query.
+def issue_download_token(version, user, expires_at) -> str:
+    return signing.dumps(
+        {"v": str(version.id), "u": str(user.pk), "e": int(expires_at.timestamp())},
+        salt=SIGNING_SALT
+    )
+
+
+def load_download_token(token):
+    try:
+        payload = signing.loads(token, salt=SIGNING_SALT)
+    except signing.BadSignature:
+        return None
+
+    if payload["e"] < timezone.now().timestamp():
+        raise DownloadLinkExpired()
+    return payload
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+# Returns the linked version or None; both token formats are accepted so
+# links issued before signed tokens were enabled keep working.
+def get_download_version(token):
+    payload = load_download_token(token)
+    if payload is not None:
+        return DocumentVersion.objects.filter(pk=payload["v"]).first()
+
+    if not _is_uuid(token):
+        return None
+
+    link = DownloadLink.objects.select_related('document_version').filter(token=token).first()
+    if link is None:
+        return None
+    if link.is_expired():
+        raise DownloadLinkExpired()
+    return link.document_version
+
+
+async def aget_download_version(token):
+    payload = load_download_token(token)
+    if payload is not None:
+        return await DocumentVersion.objects.filter(pk=payload["v"]).afirst()
+
+    if not _is_uuid(token):
+        return None
+
+    link = await DownloadLink.objects.select_related('document_version').filter(token=token).afirst()
+    if link is None:
+        return None
+    if link.is_expired():
+        raise DownloadLinkExpired()
+    return link.document_version
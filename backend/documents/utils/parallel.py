@@ -0,0 +1,96 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+
+
+def _batched(tasks, size):
+    batch = []
+    for task in tasks:
+        batch.append(task)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Runs a per-segment function over batches of independent segments on a
+# thread or process pool and yields the results in input order. At most
+# `window` batches are in flight, so memory stays bounded by
+# window * batch_segments * segment size however large the file is.
+class SegmentEngine:
+    def __init__(self, mode='serial', workers=None, window=None, batch_segments=16):
+        if mode not in ('serial', 'thread', 'process'):
+            raise ValueError(f"Unknown segment engine mode: {mode}")
+
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.window = window or self.workers * 2
+        self.batch_segments = batch_segments
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is not None and self._pid == os.getpid():
+            return self._executor
+
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                if self.mode == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='segment-engine')
+        return self._executor
+
+    # func(dek, header, batch) -> list of results, one per (index, data,
+    # final) task in the batch; it must be picklable in process mode.
+    def run(self, func, dek, header, tasks):
+        batches = _batched(tasks, self.batch_segments)
+
+        if self.mode == 'serial':
+            for batch in batches:
+                yield from func(dek, header, batch)
+            return
+
+        first = next(batches, None)
+        if first is None:
+            return
+        second = next(batches, None)
+        if second is None:
+            yield from func(dek, header, first)
+            return
+
+        pool = self._pool()
+        pending = deque()
+        try:
+            for batch in (first, second):
+                pending.append(pool.submit(func, dek, header, batch))
+
+            for batch in batches:
+                if len(pending) >= self.window:
+                    yield from pending.popleft().result()
+                pending.append(pool.submit(func, dek, header, batch))
+
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+
+
+segment_engine = SegmentEngine(
+    mode=settings.DOCUMENTS_CRYPTO_ENGINE,
+    workers=settings.DOCUMENTS_CRYPTO_WORKERS,
+    window=settings.DOCUMENTS_CRYPTO_WINDOW,
+    batch_segments=settings.DOCUMENTS_CRYPTO_BATCH_SEGMENTS
+)
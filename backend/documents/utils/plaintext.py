@@ -0,0 +1,95 @@
+from .codecs import decompress_stream
+from .crypto import (
+    decrypt_file,
+    decrypt_stream,
+    parse_segment_header,
+    segmented_plaintext_size,
+    SEGMENT_HEADER_SIZE
+)
+from .delta import apply_delta
+from .storage import open_blob, open_blob_range
+
+
+# Decrypts whatever is stored for the version, i.e. the delta payload
+# for delta versions.
+def read_payload(version, dek: bytes) -> bytes:
+    if version.encryption_format == 'fernet':
+        with open_blob(version.file) as f:
+            return decrypt_file(f.read(), dek)
+
+    size = version.file.size
+    with open_blob(version.file) as f:
+        return b''.join(decompress_stream(decrypt_stream(f, dek, size), version.codec))
+
+
+# Loads the versions from `version` back to the nearest full one.
+# Chains are capped by DOCUMENTS_DELTA_KEYFRAME_INTERVAL.
+def delta_chain(version):
+    chain = [version]
+    while version.storage_kind == 'delta':
+        version = version.base_version
+        chain.append(version)
+    return chain
+
+
+# Replays the deltas of a chain from delta_chain on top of its full
+# version. Only reads blobs; the rows are already loaded.
+def replay_chain(chain, dek: bytes) -> bytes:
+    data = read_payload(chain[-1], dek)
+    for delta_version in reversed(chain[:-1]):
+        data = apply_delta(data, read_payload(delta_version, dek))
+    return data
+
+
+class PlaintextReader:
+    def __init__(self, version, dek: bytes):
+        self.version = version
+        self.dek = dek
+        self._buffer = None
+
+        if version.storage_kind == 'delta':
+            # The chain rows are loaded here so stream() never touches the
+            # database; the plaintext is rebuilt on first read and is at
+            # most DOCUMENTS_DELTA_MAX_SIZE.
+            self.chain = delta_chain(version)
+            self.size = version.plaintext_size
+        elif version.encryption_format == 'fernet':
+            with open_blob(version.file) as f:
+                self._buffer = decrypt_file(f.read(), dek)
+            self.size = len(self._buffer)
+        elif version.codec != 'none':
+            self.ciphertext_size = version.file.size
+            self.size = version.plaintext_size
+        else:
+            self.ciphertext_size = version.file.size
+            with open_blob_range(version.file, 0, SEGMENT_HEADER_SIZE) as f:
+                segment_size = parse_segment_header(f.read(SEGMENT_HEADER_SIZE))
+            self.size = segmented_plaintext_size(self.ciphertext_size, segment_size)
+
+    def stream(self, start: int = 0, stop: int | None = None):
+        stop = self.size if stop is None else stop
+
+        if self._buffer is None and self.version.storage_kind == 'delta':
+            self._buffer = replay_chain(self.chain, self.dek)
+        if self._buffer is not None:
+            yield self._buffer[start:stop]
+            return
+
+        with open_blob(self.version.file) as f:
+            if self.version.codec == 'none':
+                yield from decrypt_stream(f, self.dek, self.ciphertext_size, start, stop)
+                return
+
+            # Compressed streams cannot seek, so ranges decompress from
+            # the beginning and drop everything before start.
+            position = 0
+            for chunk in decompress_stream(decrypt_stream(f, self.dek, self.ciphertext_size), self.version.codec):
+                end = position + len(chunk)
+                if end > start:
+                    yield chunk[max(start - position, 0):stop - position]
+                if end >= stop:
+                    return
+                position = end
+
+    def read(self) -> bytes:
+        return b''.join(self.stream())
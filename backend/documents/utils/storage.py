@@ -0,0 +1,307 @@
+import io
+import os
+import shutil
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage, storages
+from django.utils.functional import LazyObject, empty
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_WORKERS = 4
+
+
+# Exposes only [start, stop) of an open file. fileno() is kept so WSGI
+# servers with a file_wrapper (gunicorn, uwsgi) can hand the range to
+# os.sendfile: they send Content-Length bytes from the current offset.
+class RangeFile:
+    def __init__(self, file, start, stop):
+        self.file = file
+        self.name = getattr(file, 'name', '')
+        self.remaining = stop - start
+        file.seek(start)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Seekable reader that fetches the blob through open_range, so decrypting
+# a byte range only downloads the segments it covers.
+class BlobReader:
+    def __init__(self, storage, name, read_ahead=DEFAULT_PART_SIZE):
+        self.storage = storage
+        self.name = name
+        self.size = storage.size(name)
+        self.read_ahead = read_ahead
+        self.position = 0
+        self._buffer = b''
+        self._buffer_start = 0
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = offset
+        return offset
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        stop = self.size if size < 0 else min(self.position + size, self.size)
+        parts = []
+        while self.position < stop:
+            offset = self.position - self._buffer_start
+            if not 0 <= offset < len(self._buffer):
+                fetch_stop = min(max(stop, self.position + self.read_ahead), self.size)
+                with self.storage.open_range(self.name, self.position, fetch_stop) as f:
+                    self._buffer = f.read()
+                self._buffer_start = self.position
+                offset = 0
+            data = self._buffer[offset:offset + stop - self.position]
+            parts.append(data)
+            self.position += len(data)
+        return b''.join(parts)
+
+    def close(self):
+        self._buffer = b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _parts(chunks, part_size):
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+# Storage for encrypted blobs: multipart writes with parallel part
+# uploads and ranged reads on top of the Django API.
+class BlobStorage(Storage, ABC):
+    def __init__(self, part_size=DEFAULT_PART_SIZE, workers=DEFAULT_WORKERS):
+        self.part_size = part_size
+        self.workers = workers
+
+    @abstractmethod
+    def create_multipart(self, name):
+        pass
+
+    @abstractmethod
+    def upload_part(self, name, upload_id, number, data):
+        pass
+
+    @abstractmethod
+    def complete_multipart(self, name, upload_id):
+        pass
+
+    @abstractmethod
+    def abort_multipart(self, name, upload_id):
+        pass
+
+    @abstractmethod
+    def open_range(self, name, start, stop):
+        pass
+
+    def open_reader(self, name):
+        return BlobReader(self, name, read_ahead=self.part_size)
+
+    # Parts are produced on the calling thread (chunks() is usually the
+    # encryptor) and uploaded by the pool; at most 2 * workers parts are
+    # held in memory.
+    def write_multipart(self, name, chunks):
+        upload_id = self.create_multipart(name)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                pending = set()
+                number = 0
+                for number, data in enumerate(_parts(chunks, self.part_size), start=1):
+                    if len(pending) >= self.workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    pending.add(executor.submit(self.upload_part, name, upload_id, number, data))
+
+                if number == 0:
+                    pending.add(executor.submit(self.upload_part, name, upload_id, 1, b''))
+                for future in pending:
+                    future.result()
+        except BaseException:
+            self.abort_multipart(name, upload_id)
+            raise
+
+        self.complete_multipart(name, upload_id)
+        return name
+
+
+# Regular saves keep FileSystemStorage._save: writing one local file is
+# disk bound, so the parallel multipart path would only add a copy. The
+# multipart methods are there for callers that assemble parts themselves.
+class LocalBlobStorage(BlobStorage, FileSystemStorage):
+    def __init__(self, part_size=DEFAULT_PART_SIZE, workers=DEFAULT_WORKERS, **kwargs):
+        BlobStorage.__init__(self, part_size, workers)
+        FileSystemStorage.__init__(self, **kwargs)
+
+    def _multipart_dir(self, upload_id):
+        return os.path.join(self.location, '.multipart', upload_id)
+
+    def create_multipart(self, name):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._multipart_dir(upload_id))
+        return upload_id
+
+    def upload_part(self, name, upload_id, number, data):
+        with open(os.path.join(self._multipart_dir(upload_id), f'{number:06d}'), 'wb') as f:
+            f.write(data)
+
+    def complete_multipart(self, name, upload_id):
+        directory = self._multipart_dir(upload_id)
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, 'wb') as target:
+            for part in sorted(os.listdir(directory)):
+                with open(os.path.join(directory, part), 'rb') as source:
+                    shutil.copyfileobj(source, target, self.part_size)
+        shutil.rmtree(directory)
+        return name
+
+    def abort_multipart(self, name, upload_id):
+        shutil.rmtree(self._multipart_dir(upload_id), ignore_errors=True)
+
+    def open_range(self, name, start, stop):
+        return RangeFile(open(self.path(name), 'rb'), start, stop)
+
+    def open_reader(self, name):
+        return open(self.path(name), 'rb')
+
+
+# In-process stand-in for an S3-compatible bucket. Enforces the S3 rule
+# that every part but the last is at least min_part_size bytes.
+class InMemoryS3Storage(BlobStorage):
+    def __init__(self, part_size=DEFAULT_PART_SIZE, workers=DEFAULT_WORKERS, min_part_size=5 * 1024 * 1024):
+        super().__init__(part_size, workers)
+        self.min_part_size = min_part_size
+        self._objects = {}
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def _open(self, name, mode='rb'):
+        return ContentFile(self._objects[name], name=name)
+
+    def _save(self, name, content):
+        return self.write_multipart(name, content.chunks())
+
+    def create_multipart(self, name):
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = {}
+        return upload_id
+
+    def upload_part(self, name, upload_id, number, data):
+        with self._lock:
+            self._uploads[upload_id][number] = data
+
+    def complete_multipart(self, name, upload_id):
+        with self._lock:
+            parts = self._uploads.pop(upload_id)
+        numbers = sorted(parts)
+        if any(len(parts[number]) < self.min_part_size for number in numbers[:-1]):
+            raise ValueError("Multipart upload part is smaller than the minimum part size")
+        with self._lock:
+            self._objects[name] = b''.join(parts[number] for number in numbers)
+        return name
+
+    def abort_multipart(self, name, upload_id):
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+
+    def open_range(self, name, start, stop):
+        return io.BytesIO(self._objects[name][start:stop])
+
+    def delete(self, name):
+        with self._lock:
+            self._objects.pop(name, None)
+
+    def exists(self, name):
+        return name in self._objects
+
+    def size(self, name):
+        return len(self._objects[name])
+
+    def listdir(self, path):
+        prefix = path.rstrip('/') + '/' if path else ''
+        directories, files = set(), []
+        for name in self._objects:
+            if name.startswith(prefix):
+                head, _, tail = name[len(prefix):].partition('/')
+                if tail:
+                    directories.add(head)
+                else:
+                    files.append(head)
+        return sorted(directories), sorted(files)
+
+    # There is no endpoint behind the bucket; blobs are only served through
+    # the decrypt and download views. DRF's FileField renders None as null.
+    def url(self, name):
+        return None
+
+
+class DocumentStorage(LazyObject):
+    def _setup(self):
+        self._wrapped = storages['documents']
+
+
+document_storage = DocumentStorage()
+
+
+def get_document_storage():
+    return document_storage
+
+
+def reset_document_storage():
+    document_storage._wrapped = empty
+
+
+def open_blob(fieldfile):
+    storage = fieldfile.storage
+    if isinstance(storage, BlobStorage):
+        return storage.open_reader(fieldfile.name)
+    return fieldfile.open('rb')
+
+
+def open_blob_range(fieldfile, start, stop):
+    storage = fieldfile.storage
+    if isinstance(storage, BlobStorage):
+        return storage.open_range(fieldfile.name, start, stop)
+    return RangeFile(fieldfile.open('rb'), start, stop)
@@ -0,0 +1,156 @@
+import hashlib
+import tempfile
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.core.files.base import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from documents.models import DocumentVersion, UploadPart, UploadSession
+from .crypto import SEGMENT_SIZE, content_mac, seal_segments, segment_header
+
+
+class IncompletePart(Exception):
+    pass
+
+
+class PartConflict(Exception):
+    pass
+
+
+class IncompleteUpload(Exception):
+    def __init__(self, missing):
+        super().__init__(missing)
+        self.missing = missing
+
+
+class IterableFile(File):
+    def __init__(self, chunks, name):
+        super().__init__(None, name=name)
+        self._chunks = chunks
+
+    def chunks(self, chunk_size=None):
+        return self._chunks
+
+    def multiple_chunks(self, chunk_size=None):
+        return True
+
+
+def session_expiry():
+    return timezone.now() + timedelta(seconds=settings.DOCUMENTS_UPLOAD_SESSION_TTL)
+
+
+def _blocks(stream, size):
+    if size == 0:
+        yield b''
+        return
+
+    remaining = size
+    while remaining:
+        want = min(SEGMENT_SIZE, remaining)
+        block = bytearray()
+        while len(block) < want:
+            data = stream.read(want - len(block)) if stream is not None else b''
+            if not data:
+                raise IncompletePart()
+            block += data
+        remaining -= want
+        yield bytes(block)
+
+
+def _part_chunks(parts):
+    for part in parts:
+        with part.file.open('rb') as f:
+            yield from f.chunks()
+
+
+def _digesting(chunks, digest):
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+# Parts are sealed into a spooled temp file first, so a truncated body or
+# a retry with different content never reaches storage. Re-sending a part
+# with the same content is a no-op; different content is a conflict, since
+# it would reuse the segment nonces of the stored part.
+def write_part(session, number, stream, dek):
+    size = session.part_size(number)
+    header = segment_header(bytes(session.salt))
+    first_index = (number - 1) * session.chunk_size // SEGMENT_SIZE
+    last_index = max(1, -(-session.total_size // SEGMENT_SIZE)) - 1
+    mac = content_mac(dek)
+
+    def plaintext():
+        for block in _blocks(stream, size):
+            mac.update(block)
+            yield block
+
+    with tempfile.SpooledTemporaryFile(max_size=SEGMENT_SIZE * 4) as sealed:
+        for segment in seal_segments(dek, header, plaintext(), first_index, last_index):
+            sealed.write(segment)
+        content_hmac = mac.hexdigest()
+
+        existing = session.parts.filter(number=number).first()
+        if existing is not None:
+            if existing.content_hmac != content_hmac:
+                raise PartConflict()
+            return existing
+
+        part = UploadPart(session=session, number=number, size=size, content_hmac=content_hmac)
+        sealed.seek(0)
+        part.file.save(f'{session.id}.{number}', File(sealed), save=False)
+
+    try:
+        with transaction.atomic():
+            part.save()
+    except IntegrityError:
+        part.file.storage.delete(part.file.name)
+        existing = session.parts.get(number=number)
+        if existing.content_hmac != content_hmac:
+            raise PartConflict()
+        return existing
+
+    UploadSession.objects.filter(pk=session.pk).update(expires_at=session_expiry())
+    return part
+
+
+# Returns (version, created). Committing twice returns the version created
+# by the first commit.
+def commit_session(session, user):
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().select_related('document').get(pk=session.pk)
+        if session.version_id is not None:
+            return session.version, False
+
+        parts = list(session.parts.order_by('number'))
+        received = {part.number for part in parts}
+        missing = [number for number in range(1, session.part_count + 1) if number not in received]
+        if missing:
+            raise IncompleteUpload(missing)
+
+        document = session.document
+        last_version = document.versions.first()
+        version = DocumentVersion(
+            document=document,
+            version_number=last_version.version_number + 1 if last_version else 1,
+            uploaded_by=user,
+            status='pending',
+            codec='none',
+            plaintext_size=session.total_size
+        )
+
+        digest = hashlib.sha256()
+        chunks = chain([segment_header(bytes(session.salt))], _part_chunks(parts))
+        name = session.filename + '.enc'
+        version.file.save(name, IterableFile(_digesting(chunks, digest), name=name), save=False)
+        version.ciphertext_sha256 = digest.hexdigest()
+        version.save()
+
+        session.version = version
+        session.save(update_fields=['version'])
+        session.parts.all().delete()
+
+    return version, True
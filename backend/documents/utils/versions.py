@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from documents.models import Document, DocumentVersion
+from .codecs import choose_codec
+from .crypto import EncryptedUpload, content_mac
+from .delta import make_delta
+from .plaintext import PlaintextReader
+
+
+def _delta_base(base, file):
+    if not settings.DOCUMENTS_DELTA_ENABLED or base is None:
+        return None
+    # Both sides are held in memory to diff, and again on every rebuild.
+    if file.size > settings.DOCUMENTS_DELTA_MAX_SIZE:
+        return None
+    if base.plaintext_size is None or base.plaintext_size > settings.DOCUMENTS_DELTA_MAX_SIZE:
+        return None
+    if base.chain_depth + 1 >= settings.DOCUMENTS_DELTA_KEYFRAME_INTERVAL:
+        return None
+    return base
+
+
+# Stores the upload as a delta against base when that is small enough,
+# otherwise returns None and the caller stores a full copy.
+def _delta_upload(version, base, file, dek, name, codec):
+    content = b''.join(file.chunks())
+    delta = make_delta(PlaintextReader(base, dek).read(), content)
+    if len(delta) > len(content) * settings.DOCUMENTS_DELTA_MAX_RATIO:
+        return None
+
+    mac = content_mac(dek)
+    mac.update(content)
+
+    version.storage_kind = 'delta'
+    version.base_version = base
+    version.chain_depth = base.chain_depth + 1
+    version.plaintext_size = len(content)
+    upload = EncryptedUpload(ContentFile(delta), dek, name=name, codec=codec)
+    version.file.save(name, upload, save=False)
+    version.ciphertext_sha256 = upload.ciphertext_sha256
+    return mac.hexdigest()
+
+
+# Blobs are only shared between versions of one document, so the document
+# row guards them: deduplicating onto a blob and deciding that its last
+# reference is gone both happen under this lock.
+def _lock_document(document_id):
+    Document.objects.select_for_update().filter(pk=document_id).values_list('pk', flat=True).first()
+
+
+def store_version(document, uploaded_by, file, dek, name, version_number, status='approved', base=None):
+    version = DocumentVersion(
+        document=document,
+        version_number=version_number,
+        uploaded_by=uploaded_by,
+        status=status,
+        codec=choose_codec(file, file.name)
+    )
+
+    content_hmac = None
+    delta_base = _delta_base(base, file)
+    if delta_base is not None:
+        content_hmac = _delta_upload(version, delta_base, file, dek, name, version.codec)
+
+    if content_hmac is None:
+        upload = EncryptedUpload(file, dek, name=name, codec=version.codec)
+        version.file.save(name, upload, save=False)
+        content_hmac = upload.content_hmac
+        version.plaintext_size = upload.plaintext_size
+        version.ciphertext_sha256 = upload.ciphertext_sha256
+    version.content_hmac = content_hmac
+
+    with transaction.atomic():
+        _lock_document(document.pk)
+        duplicate = (
+            DocumentVersion.objects.filter(document=document, content_hmac=content_hmac)
+            .exclude(file=version.file.name)
+            .first()
+        )
+        if duplicate is not None:
+            version.file.storage.delete(version.file.name)
+            version.file.name = duplicate.file.name
+            version.encryption_format = duplicate.encryption_format
+            version.codec = duplicate.codec
+            version.ciphertext_sha256 = duplicate.ciphertext_sha256
+            version.storage_kind = duplicate.storage_kind
+            version.base_version_id = duplicate.base_version_id
+            version.chain_depth = duplicate.chain_depth
+
+        version.save()
+    return version
+
+
+def release_blob(version):
+    name = version.file.name
+    if not name:
+        return
+
+    with transaction.atomic():
+        _lock_document(version.document_id)
+        if DocumentVersion.objects.filter(file=name).exists():
+            return
+
+        storage = version.file.storage
+        transaction.on_commit(lambda: storage.delete(name))
@@ -3,25 +3,33 @@ from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from datetime import timedelta
-from django.db import models
-from django.http import FileResponse
-from django.core.files.base import ContentFile
-from io import BytesIO
+from django.conf import settings
+from django.db import models, transaction
 
-from .models import Document, DocumentVersion, DocumentAccess, DownloadLink
+from .models import Document, DocumentVersion, DocumentAccess, DownloadLink, UploadSession
+from .pagination import DocumentPagination
 from .serializers import (
     DocumentSerializer,
     DocumentCreateSerializer,
     DocumentVersionSerializer,
     DocumentVersionCreateSerializer,
     ShareDocumentSerializer,
-    DownloadLinkSerializer
+    BulkShareDocumentSerializer,
+    DownloadLinkSerializer,
+    UploadSessionSerializer
 )
 from .permissions import IsOwnerOrHasAccess, CanEditDocument
-from .utils.crypto import encrypt_file, decrypt_dek_for_user, decrypt_file
+from .utils.access import get_document_access
+from .utils.dek import unwrap_document_dek
+from .utils.http import conditional_response, file_response, listing_etag, ranged_streaming_response
+from .utils.links import DownloadLinkExpired, get_download_version, issue_download_token
+from .utils.plaintext import PlaintextReader
+from .utils.uploads import IncompletePart, IncompleteUpload, PartConflict, commit_session, write_part
+from .utils.versions import store_version
 from audit.utils.audit import log_action
 from config.constants import AuditAction
 from audit.utils.request import get_client_ip  
@@ -30,17 +38,36 @@ from audit.utils.request import get_client_ip
 class DocumentViewSet(viewsets.ModelViewSet):
     queryset = Document.objects.filter(is_active=True)
     permission_classes = [IsAuthenticated]
+    pagination_class = DocumentPagination
 
     def get_queryset(self): # type: ignore
         user = self.request.user
 
+        shared = DocumentAccess.objects.filter(document=models.OuterRef('pk'), user=user)
+
         return Document.objects.filter(
             is_active=True
         ).filter(
             models.Q(owner=user) |
-            models.Q(access_list__user=user)
-        ).distinct()
+            models.Exists(shared)
+        ).select_related('owner')
     
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return super().list(request, *args, **kwargs)
+
+        etag = listing_etag(f"{document.id}:{document.updated_at.isoformat()}" for document in page)
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response['ETag'] = etag
+        return response
+
     def get_serializer_class(self): # type: ignore
         if self.action == 'create':
             return DocumentCreateSerializer
@@ -49,15 +76,23 @@ class DocumentViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['retrieve', 'update', 'partial_update', 'destroy']:
             return [IsAuthenticated(), IsOwnerOrHasAccess()]
-        return [IsAuthenticated()]
+        return super().get_permissions()
 
     
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsOwnerOrHasAccess])
     def versions(self, request, pk=None):
         document = self.get_object()
-        versions = document.versions.all()
+        versions = list(document.versions.select_related('uploaded_by'))
+
+        etag = listing_etag(f"{version.id}:{version.status}:{version.ciphertext_sha256}" for version in versions)
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
         serializer = DocumentVersionSerializer(versions, many=True)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        response['ETag'] = etag
+        return response
     
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, CanEditDocument])
@@ -73,22 +108,24 @@ class DocumentViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             file = serializer.validated_data['file']
 
-            access = DocumentAccess.objects.get(document=document, user=user)
-            dek = decrypt_dek_for_user(access.encrypted_dek, user.private_key.encode())
+            access = get_document_access(request, document)
+            if access is None:
+                raise NotFound("No access to this document.")
 
-            file_bytes = file.read()
-            encrypted_bytes = encrypt_file(file_bytes, dek)
-            encrypted_file = ContentFile(encrypted_bytes, name=file.name + '.enc')
+            dek = unwrap_document_dek(access, user)
 
             last_version = document.versions.first()
             new_version_number = last_version.version_number + 1 if last_version else 1
 
-            DocumentVersion.objects.create(
-                document=document,
-                file=encrypted_file,
+            store_version(
+                document,
+                user,
+                file,
+                dek,
+                name=file.name + '.enc',
                 version_number=new_version_number,
-                uploaded_by=user,
-                status='pending'  
+                status='pending',
+                base=last_version
             )
 
             log_action(
@@ -110,6 +147,124 @@ class DocumentViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, CanEditDocument])
+    def upload_sessions(self, request, pk=None):
+        document = self.get_object()
+
+        serializer = UploadSessionSerializer(
+            data=request.data,
+            context={'request': request, 'document': document}
+        )
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save()
+
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+    def get_upload_session(self, document, session_id):
+        session = get_object_or_404(
+            UploadSession.objects.prefetch_related('parts'),
+            id=session_id,
+            document=document,
+            created_by=self.request.user
+        )
+        if session.is_expired() and session.version_id is None:
+            raise NotFound("Upload session expired.")
+        return session
+
+
+    @action(
+        detail=True,
+        methods=['get', 'delete'],
+        permission_classes=[IsAuthenticated, CanEditDocument],
+        url_path='upload_sessions/(?P<session_id>[^/.]+)'
+    )
+    def upload_session(self, request, pk=None, session_id=None):
+        document = self.get_object()
+        session = self.get_upload_session(document, session_id)
+
+        if request.method == 'DELETE':
+            session.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        return Response(UploadSessionSerializer(session).data)
+
+
+    # The body is the raw part, read from the request stream so it is never
+    # buffered by the parsers. Parts are numbered from 1.
+    @action(
+        detail=True,
+        methods=['put'],
+        permission_classes=[IsAuthenticated, CanEditDocument],
+        url_path=r'upload_sessions/(?P<session_id>[^/.]+)/parts/(?P<number>\d+)'
+    )
+    def upload_part(self, request, pk=None, session_id=None, number=None):
+        document = self.get_object()
+        session = self.get_upload_session(document, session_id)
+        number = int(number)
+
+        if session.version_id is not None:
+            return Response({"detail": "Upload session already committed"}, status=status.HTTP_409_CONFLICT)
+        if not 1 <= number <= session.part_count:
+            return Response({"detail": f"Part number must be between 1 and {session.part_count}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        expected = session.part_size(number)
+        if (request.META.get('CONTENT_LENGTH') or '0') != str(expected):
+            return Response({"detail": f"Part {number} must be exactly {expected} bytes"}, status=status.HTTP_400_BAD_REQUEST)
+
+        access = get_document_access(request, document)
+        if access is None:
+            raise NotFound("No access to this document.")
+
+        dek = unwrap_document_dek(access, request.user)
+
+        try:
+            part = write_part(session, number, request.stream, dek)
+        except IncompletePart:
+            return Response({"detail": f"Part {number} was truncated"}, status=status.HTTP_400_BAD_REQUEST)
+        except PartConflict:
+            return Response({"detail": f"Part {number} was already uploaded with different content"}, status=status.HTTP_409_CONFLICT)
+
+        return Response({"number": part.number, "size": part.size})
+
+
+    @action(
+        detail=True,
+        methods=['post'],
+        permission_classes=[IsAuthenticated, CanEditDocument],
+        url_path='upload_sessions/(?P<session_id>[^/.]+)/commit'
+    )
+    def commit_upload_session(self, request, pk=None, session_id=None):
+        document = self.get_object()
+        session = self.get_upload_session(document, session_id)
+
+        try:
+            with transaction.atomic():
+                version, created = commit_session(session, request.user)
+                if created:
+                    log_action(
+                        user=request.user,
+                        action=AuditAction.UPDATE,
+                        target_type="DocumentVersion",
+                        target_id=document.id,
+                        old_data={
+                            "last_version": version.version_number - 1 or None
+                        },
+                        new_data={
+                            "new_version": version.version_number,
+                            "upload_session": str(session.id)
+                        },
+                        ip_address=get_client_ip(request)
+                    )
+        except IncompleteUpload as e:
+            return Response({"detail": "Missing parts", "missing": e.missing}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            DocumentVersionSerializer(version).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsOwnerOrHasAccess])
     def approve_version(self, request, pk=None):
         version_id = request.data.get('version_id')
@@ -168,12 +323,56 @@ class DocumentViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def share_bulk(self, request, pk=None):
+        document = self.get_object()
+
+        if document.owner != request.user:
+            return Response(
+                {"detail": "Only owner can share document."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = BulkShareDocumentSerializer(
+            data=request.data,
+            context={'request': request, 'document': document}
+        )
+
+        if serializer.is_valid():
+            accesses = serializer.save()
+            return Response(
+                {"detail": "Access granted", "count": len(accesses)},
+                status=status.HTTP_201_CREATED
+            )
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsOwnerOrHasAccess])
     def create_download_link(self, request, pk=None):
         document = self.get_object()
         version = document.versions.first()
 
-        expires_at = timezone.now() + timedelta(hours=1)
+        expires_at = timezone.now() + timedelta(seconds=settings.DOCUMENTS_DOWNLOAD_LINK_TTL)
+
+        if settings.DOCUMENTS_SIGNED_DOWNLOAD_LINKS:
+            token = issue_download_token(version, request.user, expires_at)
+
+            log_action(
+                user=request.user,
+                action=AuditAction.CREATE,
+                target_type="DownloadLink",
+                target_id=None,
+                old_data=None,
+                new_data={
+                    "document_version_id": str(version.id),
+                    "expires_at": str(expires_at),
+                    "signed": True
+                },
+                ip_address=get_client_ip(request)
+            )
+
+            return Response({"token": token, "expires_at": expires_at})
 
         link = DownloadLink.objects.create(
             document_version=version,
@@ -200,18 +399,23 @@ class DocumentViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='download/(?P<token>[^/.]+)')
     def download(self, request, token=None):
-        link = get_object_or_404(DownloadLink, token=token)
-
-        if link.is_expired():
+        try:
+            version = get_download_version(token)
+        except DownloadLinkExpired:
             return Response({"detail": "Link expired"}, status=status.HTTP_400_BAD_REQUEST)
 
-        file = link.document_version.file
+        if version is None:
+            raise NotFound()
+
+        not_modified = conditional_response(request, version.etag, version.uploaded_at)
+        if not_modified is not None:
+            return not_modified
 
         log_action(
             user=request.user,
             action=AuditAction.DOWNLOAD,
             target_type="DocumentVersion",
-            target_id=link.document_version.id,
+            target_id=version.id,
             old_data=None,
             new_data={
                 "link_token": str(token)
@@ -219,17 +423,21 @@ class DocumentViewSet(viewsets.ModelViewSet):
             ip_address=get_client_ip(request)
         )
 
-        return FileResponse(file.open('rb'), as_attachment=True)
+        return file_response(
+            request,
+            version.file,
+            etag=version.etag,
+            last_modified=version.uploaded_at
+        )
     
 
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsOwnerOrHasAccess])
     def my_dek(self, request, pk=None):
         document = self.get_object()
 
-        access = DocumentAccess.objects.get(
-            document=document,
-            user=request.user
-        )
+        access = get_document_access(request, document)
+        if access is None:
+            raise NotFound("No access to this document.")
 
         encoded_dek = base64.b64encode(access.encrypted_dek).decode('utf-8')
 
@@ -241,26 +449,24 @@ class DocumentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsOwnerOrHasAccess])
     def decrypt(self, request, pk=None):
         document = self.get_object()
+        version = document.versions.first()
 
-        access = DocumentAccess.objects.get(
-            document=document,
-            user=request.user
-        )
-
-        dek = decrypt_dek_for_user(
-            access.encrypted_dek,
-            request.user.private_key.encode()
-        )
+        not_modified = conditional_response(request, version.etag, version.uploaded_at)
+        if not_modified is not None:
+            return not_modified
 
-        version = document.versions.first()
-        encrypted_bytes = version.file.read()
-        decrypted_bytes = decrypt_file(encrypted_bytes, dek)
+        access = get_document_access(request, document)
+        if access is None:
+            raise NotFound("No access to this document.")
 
-        file_like = BytesIO(decrypted_bytes)
+        dek = unwrap_document_dek(access, request.user)
+        reader = PlaintextReader(version, dek)
 
-        response = FileResponse(
-            file_like,
-            as_attachment=True,
-            filename=version.file.name.replace('.enc', '')
+        return ranged_streaming_response(
+            request,
+            reader.stream,
+            reader.size,
+            filename=version.file.name.replace('.enc', ''),
+            etag=version.etag,
+            last_modified=version.uploaded_at
         )
-        return response
@@ -1,16 +1,15 @@
 from collections import defaultdict
-from audit.models import AuditLog
-from documents.models import Document, DocumentAccess
+from django.db.models import Count
+from documents.models import Document, DocumentAccess, ShareEvent
 
 
 class GraphAnalyticsService:
 
     @staticmethod
     def document_sharing_graph(document_id):
-        document = Document.objects.get(id=document_id)
+        document = Document.objects.select_related('owner').get(id=document_id)
 
         nodes = {}
-        edges = []
 
         owner = document.owner
         nodes[str(owner.id)] = {
@@ -19,7 +18,7 @@ class GraphAnalyticsService:
             "type": "owner"
         }
 
-        accesses = DocumentAccess.objects.filter(document=document)
+        accesses = DocumentAccess.objects.filter(document=document).select_related('user')
 
         for access in accesses:
             user = access.user
@@ -29,22 +28,20 @@ class GraphAnalyticsService:
                 "type": access.role
             }
 
-        shares = AuditLog.objects.filter(
-            action="SHARE",
-            target_type="Document",
-            target_id=document.id
+        shares = (
+            ShareEvent.objects.filter(document=document, from_user__isnull=False)
+            .order_by('timestamp')
+            .values_list('from_user_id', 'to_user_id')
         )
 
-        for share in shares:
-            from_user = share.user
-            shared_with = share.new_data.get("shared_with") if share.new_data else None
-
-            if from_user and shared_with:
-                edges.append({
-                    "from": str(from_user.id),
-                    "to": str(shared_with),
-                    "type": "SHARE"
-                })
+        edges = [
+            {
+                "from": str(from_user_id),
+                "to": str(to_user_id),
+                "type": "SHARE"
+            }
+            for from_user_id, to_user_id in shares
+        ]
 
         return {
             "nodes": list(nodes.values()),
@@ -55,14 +52,19 @@ class GraphAnalyticsService:
     def user_centrality():
         centrality = defaultdict(int)
 
-        shares = AuditLog.objects.filter(action="SHARE")
+        sent = (
+            ShareEvent.objects.filter(from_user__isnull=False)
+            .values('from_user_id')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        received = ShareEvent.objects.values('to_user_id').annotate(total=Count('id')).order_by()
 
-        for share in shares:
-            if share.user:
-                centrality[str(share.user.id)] += 1
+        for row in sent:
+            centrality[str(row['from_user_id'])] += row['total']
 
-            if share.new_data and share.new_data.get("shared_with"):
-                centrality[str(share.new_data["shared_with"])] += 1
+        for row in received:
+            centrality[str(row['to_user_id'])] += row['total']
 
         result = []
 
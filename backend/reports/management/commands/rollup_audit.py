@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reports.rollups import refresh_audit_rollups
+
+
+class Command(BaseCommand):
+    help = "Folds new AuditLog rows into the hourly and daily activity rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true', help="Rebuild the rollups from the whole audit table.")
+
+    def handle(self, *args, **options):
+        mark = refresh_audit_rollups(backfill=options['backfill'])
+        self.stdout.write(f"Audit rollups up to date until {mark}")
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.11 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Report',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('high_water_mark', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AuditRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('action', models.CharField(choices=[('CREATE', 'Создание'), ('UPDATE', 'Обновление'), ('DELETE', 'Удаление'), ('LOGIN', 'Вход'), ('LOGOUT', 'Выход'), ('SHARE', 'Предоставление доступа'), ('APPROVE', 'Подтверждение версии'), ('DOWNLOAD', 'Скачивание'), ('UPLOAD_VERSION', 'Загрузка новой версии')], max_length=20)),
+                ('target_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket'], name='reports_aud_granula_215089_idx'), models.Index(fields=['granularity', 'action', 'bucket'], name='reports_aud_granula_38fd39_idx')],
+            },
+        ),
+    ]
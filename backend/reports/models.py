@@ -1,5 +1,36 @@
 from django.db import models
+from django.conf import settings
+from config.constants import AuditAction
 
 class Report(models.Model):
     class Meta:
         managed = False
+
+
+class AuditRollup(models.Model):
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
+    action = models.CharField(max_length=20, choices=AuditAction.choices)
+    target_type = models.CharField(max_length=50, blank=True, null=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['granularity', 'bucket']),
+            models.Index(fields=['granularity', 'action', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket} | {self.user_id} | {self.action}: {self.count}"
+
+
+class RollupState(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,182 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from audit.models import AuditLog
+from .models import AuditRollup, RollupState
+
+STATE_NAME = "audit"
+TRUNCATE = {
+    "hour": TruncHour,
+    "day": TruncDay,
+}
+KEY_FIELDS = ("bucket", "user_id", "action", "target_type")
+
+
+def high_water_mark():
+    return RollupState.objects.filter(name=STATE_NAME).values_list("high_water_mark", flat=True).first()
+
+
+def _merge(granularity, rows):
+    deltas = {tuple(row[field] for field in KEY_FIELDS): row["total"] for row in rows}
+    if not deltas:
+        return
+
+    buckets = {key[0] for key in deltas}
+    existing = {
+        (rollup.bucket, rollup.user_id, rollup.action, rollup.target_type): rollup
+        for rollup in AuditRollup.objects.filter(granularity=granularity, bucket__in=buckets)
+    }
+
+    updated, created = [], []
+    for key, total in deltas.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            created.append(AuditRollup(granularity=granularity, count=total, **dict(zip(KEY_FIELDS, key))))
+        else:
+            rollup.count += total
+            updated.append(rollup)
+
+    AuditRollup.objects.bulk_update(updated, ["count"], batch_size=1000)
+    AuditRollup.objects.bulk_create(created, batch_size=1000)
+
+
+def _rollup_window(since, until):
+    logs = AuditLog.objects.filter(timestamp__lt=until)
+    if since is not None:
+        logs = logs.filter(timestamp__gte=since)
+
+    for granularity, truncate in TRUNCATE.items():
+        rows = (
+            logs.annotate(bucket=truncate("timestamp"))
+            .order_by()
+            .values(*KEY_FIELDS)
+            .annotate(total=Count("id"))
+        )
+        _merge(granularity, rows)
+
+
+def refresh_audit_rollups(backfill=False, window=timedelta(days=1)):
+    """
+    Folds audit rows newer than the stored high-water mark into the hourly
+    and daily rollups. Rows younger than REPORTS_ROLLUP_LAG seconds are left
+    for the next run so late batched inserts are not skipped. ``backfill``
+    rebuilds the rollups from the first audit row, one window at a time.
+    """
+    until = timezone.now() - timedelta(seconds=settings.REPORTS_ROLLUP_LAG)
+
+    with transaction.atomic():
+        state, _ = RollupState.objects.select_for_update().get_or_create(name=STATE_NAME)
+
+        since = state.high_water_mark
+        if backfill:
+            AuditRollup.objects.all().delete()
+            since = AuditLog.objects.order_by("timestamp").values_list("timestamp", flat=True).first()
+            if since is None:
+                since = until
+
+        if since is not None and since >= until:
+            return state.high_water_mark
+
+        start = since
+        while start is None or start < until:
+            stop = min(start + window, until) if start is not None else until
+            _rollup_window(start, stop)
+            start = stop
+
+        state.high_water_mark = until
+        state.save()
+
+    return until
+
+
+def fold_late_records(records):
+    """
+    Adds audit rows inserted after the fact (e.g. replayed from the writer's
+    spill file) that fall below the high-water mark, which the incremental
+    refresh would otherwise never count. Rows at or above the mark are left
+    for the next refresh.
+    """
+    with transaction.atomic():
+        mark = (
+            RollupState.objects.select_for_update()
+            .filter(name=STATE_NAME)
+            .values_list("high_water_mark", flat=True)
+            .first()
+        )
+        if mark is None:
+            return
+
+        late = [record for record in records if record.timestamp < mark]
+        for granularity in TRUNCATE:
+            totals = {}
+            for record in late:
+                key = (
+                    bucket_start(granularity, timezone.localtime(record.timestamp)),
+                    record.user_id,
+                    record.action,
+                    record.target_type,
+                )
+                totals[key] = totals.get(key, 0) + 1
+            _merge(granularity, [dict(zip(KEY_FIELDS, key), total=total) for key, total in totals.items()])
+
+
+def bucket_start(granularity, moment):
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _next_bucket(granularity, moment):
+    start = bucket_start(granularity, moment)
+    if start == moment:
+        return start
+    return start + (timedelta(days=1) if granularity == "day" else timedelta(hours=1))
+
+
+def _raw_counts(logs, granularity, group_by, counts):
+    logs = logs.annotate(bucket=TRUNCATE[granularity]("timestamp")).order_by()
+    for row in logs.values(*group_by).annotate(total=Count("id")):
+        key = tuple(row[field] for field in group_by)
+        counts[key] = counts.get(key, 0) + row["total"]
+
+
+def activity_counts(granularity, group_by, since=None, action=None):
+    """
+    Returns {group key: count} for audit rows since ``since``. Whole buckets
+    below the high-water mark come from the rollups; the partial bucket at
+    ``since`` and everything after the mark are counted from AuditLog.
+    """
+    mark = high_water_mark()
+    counts = {}
+
+    logs = AuditLog.objects.all()
+    if action is not None:
+        logs = logs.filter(action=action)
+
+    if mark is not None:
+        rollups = AuditRollup.objects.filter(granularity=granularity)
+        if action is not None:
+            rollups = rollups.filter(action=action)
+        if since is not None:
+            boundary = _next_bucket(granularity, since)
+            rollups = rollups.filter(bucket__gte=boundary)
+            if since < mark:
+                _raw_counts(logs.filter(timestamp__gte=since, timestamp__lt=min(boundary, mark)), granularity, group_by, counts)
+
+        for row in rollups.order_by().values(*group_by).annotate(total=Sum("count")):
+            key = tuple(row[field] for field in group_by)
+            counts[key] = counts.get(key, 0) + row["total"]
+
+        logs = logs.filter(timestamp__gte=mark)
+
+    if since is not None:
+        logs = logs.filter(timestamp__gte=since)
+    _raw_counts(logs, granularity, group_by, counts)
+
+    return counts
@@ -12,6 +12,21 @@ class DocumentActivityReportSerializer(serializers.Serializer):
     total_downloads = serializers.IntegerField()
     last_accessed = serializers.DateTimeField(allow_null=True)
 
+class DocumentActivityFilterSerializer(serializers.Serializer):
+    ORDERING_CHOICES = [
+        prefix + field
+        for field in ("title", "created_at", "total_versions", "total_downloads", "last_accessed")
+        for prefix in ("", "-")
+    ]
+
+    owner_id = serializers.UUIDField(required=False)
+    date_from = serializers.DateTimeField(required=False)
+    date_to = serializers.DateTimeField(required=False)
+    active_only = serializers.BooleanField(required=False, default=False)
+    ordering = serializers.ChoiceField(choices=ORDERING_CHOICES, default="title")
+    offset = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+
 class DownloadActivityReportSerializer(serializers.Serializer):
     user_id = serializers.UUIDField(allow_null=True)
     user_email = serializers.EmailField(allow_null=True)
@@ -1,88 +1,121 @@
 from audit.models import AuditLog
 from documents.models import Document, DocumentVersion, DownloadLink, DocumentAccess
-from django.db.models import Count, Max
-from django.db.models.functions import TruncDate
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from datetime import datetime, timedelta
+from .rollups import activity_counts
 
 
 class ReportsService:
 
     @staticmethod
     def top_active_users(days=30):
-        since = datetime.now() - timedelta(days=days)
-        queryset = (
-            AuditLog.objects.filter(timestamp__gte=since)
-            .values("user__id", "user__email")
-            .annotate(actions_count=Count("id"))
-            .order_by("-actions_count")[:10]
-        )
+        since = timezone.now() - timedelta(days=days)
+        counts = activity_counts("hour", ("user_id", "user__email"), since=since)
+        rows = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:10]
         return [
             {
-                "user_id": row["user__id"],
-                "user_email": row["user__email"],
-                "actions_count": row["actions_count"],
+                "user_id": user_id,
+                "user_email": user_email,
+                "actions_count": actions_count,
             }
-            for row in queryset
+            for (user_id, user_email), actions_count in rows
         ]
 
+    DOCUMENT_ACTIVITY_ORDERING = {
+        "title", "created_at", "total_versions", "total_downloads", "last_accessed",
+    }
+
     @staticmethod
-    def document_activity_report():
-        docs = Document.objects.all()
-        report = []
-
-        for doc in docs:
-            total_versions = getattr(doc, "versions").count()
-            total_downloads = DownloadLink.objects.filter(
-                document_version__document=doc
-            ).count()
-            last_accessed = AuditLog.objects.filter(
+    def document_activity_report(owner_id=None, date_from=None, date_to=None, active_only=False,
+                                 ordering="title", offset=0, limit=100):
+        versions = (
+            DocumentVersion.objects.filter(document=OuterRef("pk"))
+            .order_by()
+            .values("document")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        downloads = (
+            DownloadLink.objects.filter(document_version__document=OuterRef("pk"))
+            .order_by()
+            .values("document_version__document")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        last_accessed = (
+            AuditLog.objects.filter(
                 target_type="DocumentVersion",
-                target_id__in=getattr(doc, "versions").values_list("id", flat=True),
-            ).aggregate(last=Max("timestamp"))["last"]
-
-            report.append(
-                {
-                    "document_id": doc.id,
-                    "title": doc.title,
-                    "total_versions": total_versions,
-                    "total_downloads": total_downloads,
-                    "last_accessed": last_accessed,
-                }
+                target_id__in=DocumentVersion.objects.filter(
+                    document=OuterRef(OuterRef("pk"))
+                ).values("id"),
             )
-        return report
+            .order_by("-timestamp")
+            .values("timestamp")[:1]
+        )
+
+        queryset = Document.objects.all()
+        if owner_id:
+            queryset = queryset.filter(owner_id=owner_id)
+        if date_from:
+            queryset = queryset.filter(created_at__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(created_at__lt=date_to)
+        if active_only:
+            queryset = queryset.filter(is_active=True)
+
+        queryset = queryset.annotate(
+            total_versions=Coalesce(Subquery(versions, output_field=IntegerField()), Value(0)),
+            total_downloads=Coalesce(Subquery(downloads, output_field=IntegerField()), Value(0)),
+            last_accessed=Subquery(last_accessed),
+        )
+
+        field = ordering.lstrip("-")
+        if field not in ReportsService.DOCUMENT_ACTIVITY_ORDERING:
+            raise ValueError(f"Unsupported ordering: {ordering}")
+        descending = ordering.startswith("-")
+        order = getattr(F(field), "desc" if descending else "asc")(nulls_last=True)
+
+        rows = (
+            queryset.order_by(order, "-pk" if descending else "pk")
+            .values("id", "title", "total_versions", "total_downloads", "last_accessed")
+            [offset:offset + limit]
+        )
+
+        for row in rows.iterator():
+            yield {
+                "document_id": row["id"],
+                "title": row["title"],
+                "total_versions": row["total_versions"],
+                "total_downloads": row["total_downloads"],
+                "last_accessed": row["last_accessed"],
+            }
 
     @staticmethod
     def download_activity():
-        queryset = (
-            AuditLog.objects.filter(action="DOWNLOAD")
-            .values("user__id", "user__email")
-            .annotate(downloads_count=Count("id"))
-            .order_by("-downloads_count")
-        )
+        counts = activity_counts("day", ("user_id", "user__email"), action="DOWNLOAD")
+        rows = sorted(counts.items(), key=lambda item: item[1], reverse=True)
         return [
             {
-                "user_id": row["user__id"],
-                "user_email": row["user__email"],
-                "downloads_count": row["downloads_count"],
+                "user_id": user_id,
+                "user_email": user_email,
+                "downloads_count": downloads_count,
             }
-            for row in queryset
+            for (user_id, user_email), downloads_count in rows
         ]
 
     @staticmethod
     def sharing_report():
-        queryset = (
-            AuditLog.objects.filter(action="SHARE")
-            .values("user__id", "user__email")
-            .annotate(total_shared=Count("id"))
-            .order_by("-total_shared")
-        )
+        counts = activity_counts("day", ("user_id", "user__email"), action="SHARE")
+        rows = sorted(counts.items(), key=lambda item: item[1], reverse=True)
         return [
             {
-                "owner_id": row["user__id"],
-                "owner_email": row["user__email"],
-                "total_shared": row["total_shared"],
+                "owner_id": user_id,
+                "owner_email": user_email,
+                "total_shared": total_shared,
             }
-            for row in queryset
+            for (user_id, user_email), total_shared in rows
         ]
 
     @staticmethod
@@ -96,19 +129,12 @@ class ReportsService:
 
     @staticmethod
     def daily_activity(days=30):
-        since = datetime.now() - timedelta(days=days)
-
-        queryset = (
-            AuditLog.objects.filter(timestamp__gte=since)
-            .annotate(date=TruncDate("timestamp"))
-            .values("date")
-            .annotate(actions_count=Count("id"))
-            .order_by("date")
-        )
+        since = timezone.now() - timedelta(days=days)
+        counts = activity_counts("day", ("bucket",), since=since)
 
         return [
-            {"date": row["date"], "actions_count": row["actions_count"]}
-            for row in queryset
+            {"date": bucket.date(), "actions_count": actions_count}
+            for (bucket,), actions_count in sorted(counts.items())
         ]
 
     @staticmethod
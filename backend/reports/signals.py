@@ -0,0 +1,9 @@
+from django.dispatch import receiver
+
+from audit.signals import records_replayed
+from .rollups import fold_late_records
+
+
+@receiver(records_replayed)
+def fold_replayed_records(sender, records, **kwargs):
+    fold_late_records(records)
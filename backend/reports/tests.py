@@ -1,3 +1,262 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from importlib import import_module
 
-# Create your tests here.
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from audit.models import AuditLog
+from audit.utils.audit import replay_spill
+from documents.models import Document, DocumentAccess, DocumentVersion, DownloadLink, ShareEvent
+from reports.graph_service import GraphAnalyticsService
+from reports.models import AuditRollup
+from reports.rollups import refresh_audit_rollups
+from reports.services import ReportsService
+from users.models import User
+
+
+class DocumentActivityReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'pass', full_name='Owner')
+        cls.other = User.objects.create_user('other@example.com', 'pass', full_name='Other')
+        cls.admin = User.objects.create_superuser('admin@example.com', 'pass', full_name='Admin')
+
+    def create_document(self, owner, title, versions=1, downloads=0):
+        document = Document.objects.create(owner=owner, title=title)
+        version = None
+        for number in range(1, versions + 1):
+            version = DocumentVersion.objects.create(
+                document=document,
+                file=f'documents/{title}-{number}.enc',
+                version_number=number,
+                uploaded_by=owner
+            )
+        for _ in range(downloads):
+            DownloadLink.objects.create(
+                document_version=version,
+                expires_at=timezone.now() + timedelta(hours=1),
+                created_by=owner
+            )
+        return document, version
+
+    def test_report_values(self):
+        document, version = self.create_document(self.owner, 'contract', versions=3, downloads=2)
+        self.create_document(self.owner, 'empty', versions=0)
+        AuditLog.objects.create(user=self.owner, action='DOWNLOAD', target_type='DocumentVersion', target_id=version.id)
+
+        rows = {row['title']: row for row in ReportsService.document_activity_report()}
+
+        self.assertEqual(rows['contract']['total_versions'], 3)
+        self.assertEqual(rows['contract']['total_downloads'], 2)
+        self.assertIsNotNone(rows['contract']['last_accessed'])
+        self.assertEqual(rows['empty']['total_versions'], 0)
+        self.assertEqual(rows['empty']['total_downloads'], 0)
+        self.assertIsNone(rows['empty']['last_accessed'])
+
+    def test_query_count_is_constant(self):
+        for index in range(2):
+            self.create_document(self.owner, f'doc-{index}', versions=2, downloads=1)
+        with self.assertNumQueries(1):
+            small = list(ReportsService.document_activity_report())
+
+        for index in range(2, 20):
+            self.create_document(self.owner, f'doc-{index}', versions=2, downloads=1)
+        with self.assertNumQueries(1):
+            large = list(ReportsService.document_activity_report())
+
+        self.assertEqual(len(small), 2)
+        self.assertEqual(len(large), 20)
+
+    def test_filters_ordering_and_pagination(self):
+        self.create_document(self.owner, 'a', versions=1)
+        self.create_document(self.owner, 'b', versions=3)
+        self.create_document(self.other, 'c', versions=2)
+        Document.objects.filter(title='a').update(is_active=False)
+
+        rows = list(ReportsService.document_activity_report(owner_id=self.owner.id))
+        self.assertEqual([row['title'] for row in rows], ['a', 'b'])
+
+        rows = list(ReportsService.document_activity_report(active_only=True, ordering='-total_versions'))
+        self.assertEqual([row['title'] for row in rows], ['b', 'c'])
+
+        rows = list(ReportsService.document_activity_report(offset=1, limit=1))
+        self.assertEqual([row['title'] for row in rows], ['b'])
+
+    def test_endpoint_validates_filters(self):
+        self.create_document(self.owner, 'a')
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        response = client.get('/api/reports/document_activity/', {'limit': 1, 'ordering': '-title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+        response = client.get('/api/reports/document_activity/', {'ordering': 'owner'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(REPORTS_ROLLUP_LAG=0)
+class AuditRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice@example.com', 'pass', full_name='Alice')
+        cls.bob = User.objects.create_user('bob@example.com', 'pass', full_name='Bob')
+
+    def log(self, user, action, when):
+        AuditLog.objects.create(user=user, action=action, target_type='Document', timestamp=when)
+
+    def reports(self):
+        return (
+            ReportsService.top_active_users(),
+            ReportsService.daily_activity(),
+            ReportsService.download_activity(),
+            ReportsService.sharing_report(),
+        )
+
+    def test_rollups_match_raw_aggregation(self):
+        now = timezone.now()
+        for hours in (1, 2, 26, 50, 24 * 40):
+            self.log(self.alice, 'DOWNLOAD', now - timedelta(hours=hours, minutes=7))
+        self.log(self.bob, 'SHARE', now - timedelta(hours=3))
+        self.log(self.bob, 'DOWNLOAD', now - timedelta(hours=30))
+
+        expected = self.reports()
+        refresh_audit_rollups()
+        self.assertTrue(AuditRollup.objects.exists())
+        self.assertEqual(self.reports(), expected)
+
+        self.log(self.bob, 'DOWNLOAD', timezone.now())
+        self.assertEqual(ReportsService.download_activity()[1]['downloads_count'], 2)
+
+        refresh_audit_rollups()
+        after_increment = self.reports()
+        refresh_audit_rollups(backfill=True)
+        self.assertEqual(self.reports(), after_increment)
+
+    def test_replayed_records_below_the_mark_are_counted(self):
+        now = timezone.now()
+        self.log(self.alice, 'DOWNLOAD', now - timedelta(hours=5))
+        refresh_audit_rollups()
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'spill.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            for hours in (5, 30):
+                record = {
+                    'id': str(uuid.uuid4()),
+                    'user_id': self.bob.pk,
+                    'action': 'DOWNLOAD',
+                    'target_type': 'Document',
+                    'target_id': None,
+                    'timestamp': now - timedelta(hours=hours),
+                    'old_data': None,
+                    'new_data': None,
+                    'ip_address': None,
+                }
+                f.write(json.dumps(record, cls=DjangoJSONEncoder) + '\n')
+
+        expected = self.reports()
+        self.assertEqual(replay_spill(path, batch_size=10), 2)
+        self.assertNotEqual(self.reports(), expected)
+
+        refresh_audit_rollups()
+        after_replay = self.reports()
+        refresh_audit_rollups(backfill=True)
+        self.assertEqual(self.reports(), after_replay)
+
+
+class ShareGraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice@example.com', 'pass', full_name='Alice')
+        cls.bob = User.objects.create_user('bob@example.com', 'pass', full_name='Bob')
+        cls.carol = User.objects.create_user('carol@example.com', 'pass', full_name='Carol')
+        cls.document = Document.objects.create(owner=cls.alice, title='graph')
+        cls.other = Document.objects.create(owner=cls.bob, title='other')
+
+    def share(self, document, from_user, to_user, role='viewer', when=None):
+        return ShareEvent.objects.create(
+            document=document,
+            from_user=from_user,
+            to_user=to_user,
+            role=role,
+            timestamp=when or timezone.now()
+        )
+
+    def test_graph_edges_come_from_share_events(self):
+        now = timezone.now()
+        DocumentAccess.objects.create(document=self.document, user=self.alice, role='editor')
+        DocumentAccess.objects.create(document=self.document, user=self.bob, role='editor')
+        DocumentAccess.objects.create(document=self.document, user=self.carol, role='viewer')
+        self.share(self.document, self.bob, self.carol, when=now)
+        self.share(self.document, self.alice, self.bob, role='editor', when=now - timedelta(minutes=1))
+        self.share(self.document, None, self.carol, when=now)
+        self.share(self.other, self.bob, self.alice, when=now)
+
+        with self.assertNumQueries(3):
+            graph = GraphAnalyticsService.document_sharing_graph(self.document.id)
+
+        self.assertEqual(graph['edges'], [
+            {'from': str(self.alice.id), 'to': str(self.bob.id), 'type': 'SHARE'},
+            {'from': str(self.bob.id), 'to': str(self.carol.id), 'type': 'SHARE'},
+        ])
+        self.assertEqual(
+            {node['email']: node['type'] for node in graph['nodes']},
+            {'alice@example.com': 'editor', 'bob@example.com': 'editor', 'carol@example.com': 'viewer'}
+        )
+
+    def test_centrality_counts_sent_and_received_shares(self):
+        self.share(self.document, self.alice, self.bob)
+        self.share(self.document, self.alice, self.carol)
+        self.share(self.other, self.bob, self.carol)
+        self.share(self.other, None, self.alice)
+
+        scores = GraphAnalyticsService.user_centrality()
+        self.assertEqual(scores[0], {'user_id': str(self.alice.id), 'score': 3})
+        # Bob and Carol tie; their relative order is not defined.
+        self.assertCountEqual(scores[1:], [
+            {'user_id': str(self.bob.id), 'score': 2},
+            {'user_id': str(self.carol.id), 'score': 2},
+        ])
+
+    def test_backfill_collapses_duplicates_and_skips_orphans(self):
+        backfill = import_module('documents.migrations.0007_backfill_shareevents').backfill_share_events
+        now = timezone.now()
+
+        def log(target_id, shared_with, when, role='viewer'):
+            AuditLog.objects.create(
+                user=self.alice,
+                action='SHARE',
+                target_type='Document',
+                target_id=target_id,
+                new_data={'shared_with': str(shared_with), 'role': role},
+                timestamp=when
+            )
+
+        log(self.document.id, self.bob.id, now)
+        log(self.document.id, self.bob.id, now + timedelta(seconds=2))
+        log(self.document.id, self.bob.id, now + timedelta(minutes=5))
+        log(self.document.id, self.carol.id, now + timedelta(seconds=1), role='editor')
+        log(uuid.uuid4(), self.bob.id, now)
+        log(self.document.id, uuid.uuid4(), now)
+
+        backfill(apps, None)
+
+        self.assertEqual(
+            list(ShareEvent.objects.order_by('timestamp').values_list('to_user', 'role', 'timestamp')),
+            [
+                (self.bob.id, 'viewer', now),
+                (self.carol.id, 'editor', now + timedelta(seconds=1)),
+                (self.bob.id, 'viewer', now + timedelta(minutes=5)),
+            ]
+        )
+        self.assertFalse(ShareEvent.objects.exclude(document=self.document).exists())
+        self.assertFalse(ShareEvent.objects.exclude(from_user=self.alice).exists())
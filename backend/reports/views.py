@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -6,6 +7,7 @@ from rest_framework.permissions import IsAdminUser
 from .serializers import (
     TopUsersReportSerializer,
     DocumentActivityReportSerializer,
+    DocumentActivityFilterSerializer,
     DownloadActivityReportSerializer,
     SharingReportSerializer,
     RolesReportSerializer,
@@ -18,6 +20,10 @@ from .serializers import (
 from .permissions import IsReportAdmin
 from .services import ReportsService
 from .graph_service import GraphAnalyticsService
+from documents.utils.keys import private_key_cache
+from documents.utils.dek import dek_cache_stats
+from users.models import PooledKeyPair
+from audit.utils.audit import audit_writer
 
 class ReportsViewSet(viewsets.ViewSet):
     permission_classes = [IsReportAdmin]
@@ -30,7 +36,9 @@ class ReportsViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def document_activity(self, request):
-        data = ReportsService.document_activity_report()
+        filters = DocumentActivityFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        data = ReportsService.document_activity_report(**filters.validated_data)
         serializer = DocumentActivityReportSerializer(data, many=True)
         return Response(serializer.data)
     
@@ -67,4 +75,17 @@ class ReportsViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def user_centrality(self, request):
         data = GraphAnalyticsService.user_centrality()
-        return Response(CentralitySerializer(data, many=True).data)
\ No newline at end of file
+        return Response(CentralitySerializer(data, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def runtime_metrics(self, request):
+        return Response({
+            "private_key_cache": private_key_cache.stats(),
+            "dek_cache": dek_cache_stats(),
+            "audit_writer": audit_writer.stats(),
+            "key_pool": {
+                "available": PooledKeyPair.objects.count(),
+                "low_water": settings.USERS_KEY_POOL_LOW_WATER,
+                "target": settings.USERS_KEY_POOL_TARGET,
+            },
+        })
@@ -1,6 +1,13 @@
 from django.contrib import admin
-from .models import User
+from .models import KeyRotation, User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ("id", "email", "full_name", "role")
+
+
+@admin.register(KeyRotation)
+class KeyRotationAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "status", "processed", "total", "started_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = ("last_access_id", "resumed_at", "resumed_processed")
@@ -0,0 +1,50 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.models import PooledKeyPair
+from users.utils.keys import generate_key_pair
+
+
+def _generate(_):
+    return generate_key_pair()
+
+
+class Command(BaseCommand):
+    help = "Tops up the pool of pre-generated RSA key pairs used for new users."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', type=int, default=settings.USERS_KEY_POOL_TARGET)
+        parser.add_argument('--low-water', type=int, default=settings.USERS_KEY_POOL_LOW_WATER)
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--loop', action='store_true', help="Keep running and refill whenever the pool runs low.")
+        parser.add_argument('--interval', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                self.fill(executor, options)
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+    def fill(self, executor, options):
+        available = PooledKeyPair.objects.count()
+        if available >= options['low_water']:
+            return
+
+        missing = options['target'] - available
+        while missing > 0:
+            batch = min(missing, options['batch_size'])
+            pairs = executor.map(_generate, range(batch))
+            PooledKeyPair.objects.bulk_create(
+                PooledKeyPair(public_key=public_key, private_key=private_key)
+                for public_key, private_key in pairs
+            )
+            missing -= batch
+
+        self.stdout.write(f"Key pool filled: {options['target']} available (was {available})")
@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import KeyRotation, User
+from users.utils.rotation import RotationInProgress, run_rotation, start_rotation, unfinished_rotations
+
+
+class Command(BaseCommand):
+    help = "Rotates user key pairs and re-wraps their DEKs, resuming unfinished rotations from their checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', action='append', default=[], help="Start a rotation for this user (repeatable).")
+        parser.add_argument('--all', action='store_true', help="Start a rotation for every active user.")
+        parser.add_argument('--workers', type=int, default=settings.USERS_KEY_ROTATION_WORKERS)
+        parser.add_argument('--batch-size', type=int, default=settings.USERS_KEY_ROTATION_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep running and pick up rotations started through the API.")
+        parser.add_argument('--interval', type=float, default=5.0)
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help="Reset the attempt count of failed rotations so they are retried now."
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            KeyRotation.objects.filter(status='failed').update(attempts=0, retry_at=None)
+
+        if options['all']:
+            users = User.objects.filter(is_active=True, private_key__isnull=False)
+        else:
+            users = User.objects.filter(email__in=options['email'])
+            unknown = set(options['email']) - set(users.values_list('email', flat=True))
+            if unknown:
+                raise CommandError(f"Unknown users: {', '.join(sorted(unknown))}")
+
+        for user in users.iterator():
+            try:
+                start_rotation(user)
+            except RotationInProgress:
+                self.stdout.write(f"{user.email}: rotation already in progress, resuming it")
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                for rotation in unfinished_rotations():
+                    self.rotate(rotation, executor, options)
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+    def rotate(self, rotation, executor, options):
+        last_report = time.monotonic()
+
+        def progress(rotation):
+            nonlocal last_report
+            if time.monotonic() - last_report >= 10:
+                last_report = time.monotonic()
+                self.stdout.write(self.describe(rotation))
+
+        try:
+            rotation = run_rotation(
+                rotation,
+                executor=executor,
+                batch_size=options['batch_size'],
+                window=options['workers'] * 2,
+                progress=progress
+            )
+        except Exception as exc:
+            self.stderr.write(f"Rotation {rotation.pk} failed: {exc!r}")
+            return
+
+        # Held by another runner, waiting to be retried, or out of attempts.
+        if rotation is None:
+            return
+        self.stdout.write(self.describe(rotation))
+
+    def describe(self, rotation):
+        rate = rotation.rate
+        eta = rotation.eta_seconds
+        return (
+            f"Rotation {rotation.pk} ({rotation.status}): {rotation.processed}/{rotation.total} DEKs, "
+            f"{rate or 0:.1f}/s, ETA {'-' if eta is None else f'{eta:.0f}s'}"
+        )
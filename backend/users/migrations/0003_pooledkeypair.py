@@ -0,0 +1,22 @@
+# Generated by Django 5.2.11 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_private_key_user_public_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PooledKeyPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public_key', models.TextField()),
+                ('private_key', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
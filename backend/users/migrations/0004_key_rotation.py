@@ -0,0 +1,43 @@
+# Generated by Django 5.2.11 on 2026-10-18 18:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_pooledkeypair'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='previous_private_key',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='KeyRotation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('last_access_id', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('resumed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('resumed_processed', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='key_rotations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['running', 'failed'])), fields=('user',), name='unique_unfinished_key_rotation')],
+            },
+        ),
+    ]
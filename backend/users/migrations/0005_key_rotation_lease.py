@@ -0,0 +1,33 @@
+# Generated by Django 5.2.11 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_key_rotation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='keyrotation',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='keyrotation',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='keyrotation',
+            name='owner',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='keyrotation',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,11 +1,11 @@
 import uuid
 from django.db import models
+from django.utils import timezone
+from django.db import transaction
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.primitives import serialization
-
-from config.constants import ROLE_CHOICES
+from config.constants import KEY_ROTATION_STATUS_CHOICES, ROLE_CHOICES
+from .utils.keys import claim_key_pair
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, role='employee', **extra_fields):
@@ -14,27 +14,18 @@ class UserManager(BaseUserManager):
         
         email = self.normalize_email(email)
 
-        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
-
-        private_key_pem = key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption()
-        )
-        public_key_pem = key.public_key().public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
-
-        user = self.model(
-            email=email,
-            role=role,
-            public_key=public_key_pem.decode('utf-8'),
-            private_key=private_key_pem.decode('utf-8'),
-            **extra_fields
-        )
-        user.set_password(password)
-        user.save(using=self._db)
+        with transaction.atomic(using=self._db):
+            public_key, private_key = claim_key_pair(using=self._db)
+
+            user = self.model(
+                email=email,
+                role=role,
+                public_key=public_key,
+                private_key=private_key,
+                **extra_fields
+            )
+            user.set_password(password)
+            user.save(using=self._db)
         return user
     
     def create_superuser(self, email, password=None, **extra_fields): 
@@ -51,6 +42,8 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     public_key = models.TextField(blank=True, null=True)
     private_key = models.TextField(blank=True, null=True)
+    # Kept while a key rotation is running, for DEKs not yet re-wrapped.
+    previous_private_key = models.TextField(blank=True, null=True)
     
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
@@ -63,3 +56,76 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return f"{self.email} ({self.role})"
+
+
+class PooledKeyPair(models.Model):
+    public_key = models.TextField()
+    private_key = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+# Re-wrapping of a user's DEKs after their key pair was replaced.
+# last_access_id is the checkpoint: DocumentAccess rows are processed in
+# primary key order and everything up to it is under the new key.
+class KeyRotation(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='key_rotations'
+    )
+
+    started_by = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+
+    status = models.CharField(max_length=20, choices=KEY_ROTATION_STATUS_CHOICES, default='running')
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    last_access_id = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    # Lease of the runner working on the rotation. Another runner may only
+    # take it over once the heartbeat is older than USERS_KEY_ROTATION_LEASE.
+    owner = models.CharField(max_length=32, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    retry_at = models.DateTimeField(null=True, blank=True)
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    # Start of the current run and the progress it resumed from, so the
+    # rate is not skewed by the time a crashed rotation sat idle.
+    resumed_at = models.DateTimeField(default=timezone.now)
+    resumed_processed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(status__in=['running', 'failed']),
+                name='unique_unfinished_key_rotation'
+            ),
+        ]
+
+    @property
+    def rate(self):
+        elapsed = ((self.finished_at or timezone.now()) - self.resumed_at).total_seconds()
+        done = self.processed - self.resumed_processed
+        if elapsed <= 0 or done <= 0:
+            return None
+        return done / elapsed
+
+    @property
+    def eta_seconds(self):
+        if self.status == 'completed':
+            return 0
+        rate = self.rate
+        if rate is None:
+            return None
+        return max(0, self.total - self.processed) / rate
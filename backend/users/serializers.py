@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import User
+from .models import KeyRotation, User
 from dj_rest_auth.registration.serializers import RegisterSerializer
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -9,6 +9,38 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ["public_key"]
 
 
+class KeyRotationSerializer(serializers.ModelSerializer):
+    percent = serializers.SerializerMethodField()
+    rate = serializers.FloatField(read_only=True)
+    eta_seconds = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = KeyRotation
+        fields = [
+            "id",
+            "status",
+            "total",
+            "processed",
+            "percent",
+            "rate",
+            "eta_seconds",
+            "attempts",
+            "retry_at",
+            "error",
+            "started_at",
+            "updated_at",
+            "finished_at"
+        ]
+        read_only_fields = fields
+
+    def get_percent(self, obj):
+        if obj.status == 'completed':
+            return 100.0
+        if obj.total == 0:
+            return 0.0
+        return round(obj.processed * 100 / obj.total, 1)
+
+
 class CustomRegisterSerializer(RegisterSerializer):
     username = None 
     full_name = serializers.CharField(required=True)
@@ -11,4 +11,5 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='rest_login'),
     path('logout/', LogoutView.as_view(), name='rest_logout'),
     path('profile/', views.user_profile_view, name='user_profile'),
+    path('keys/rotation/', views.key_rotation_view, name='key_rotation'),
 ]
\ No newline at end of file
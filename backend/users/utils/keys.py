@@ -0,0 +1,37 @@
+from django.db import transaction
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import serialization
+
+
+def generate_key_pair() -> tuple[str, str]:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    private_key_pem = key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    public_key_pem = key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+    return public_key_pem.decode('utf-8'), private_key_pem.decode('utf-8')
+
+
+def claim_key_pair(using=None) -> tuple[str, str]:
+    from users.models import PooledKeyPair
+
+    with transaction.atomic(using=using):
+        pooled = (
+            PooledKeyPair.objects.using(using)
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .first()
+        )
+        if pooled is not None:
+            pooled.delete()
+            return pooled.public_key, pooled.private_key
+
+    return generate_key_pair()
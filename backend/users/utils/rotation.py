@@ -0,0 +1,225 @@
+import uuid
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from documents.models import DocumentAccess
+from documents.utils.crypto import decrypt_dek_for_user, encrypt_dek_for_user
+from documents.utils.dek import invalidate_user_deks
+from documents.utils.keys import invalidate_user_keys
+from users.models import KeyRotation, User
+from .keys import claim_key_pair
+
+UNFINISHED = ('running', 'failed')
+
+
+class RotationInProgress(Exception):
+    pass
+
+
+class RotationLost(Exception):
+    pass
+
+
+# Swaps in a new key pair right away, so new shares are wrapped for it;
+# the old private key stays readable as previous_private_key until every
+# existing DEK has been re-wrapped.
+def start_rotation(user, started_by=None):
+    with transaction.atomic():
+        user = User.objects.select_for_update().get(pk=user.pk)
+        if user.key_rotations.filter(status__in=UNFINISHED).exists():
+            raise RotationInProgress()
+
+        public_key, private_key = claim_key_pair()
+        user.previous_private_key = user.private_key
+        user.public_key, user.private_key = public_key, private_key
+        user.save(update_fields=['public_key', 'private_key', 'previous_private_key'])
+
+        return KeyRotation.objects.create(
+            user=user,
+            started_by=started_by,
+            total=DocumentAccess.objects.filter(user=user, encrypted_dek__isnull=False).count()
+        )
+
+
+# Runs in the worker processes; returns (pk, old, new) for every row that
+# still decrypts with the old key.
+def rewrap_batch(old_private_pem, new_public_pem, batch):
+    rewrapped = []
+    for pk, encrypted_dek in batch:
+        try:
+            dek = decrypt_dek_for_user(encrypted_dek, old_private_pem)
+        except ValueError:
+            # Shared after the rotation started, already under the new key.
+            continue
+        rewrapped.append((pk, encrypted_dek, encrypt_dek_for_user(dek, new_public_pem)))
+    return rewrapped
+
+
+def _batches(rotation, batch_size):
+    last = rotation.last_access_id
+    while True:
+        rows = list(
+            DocumentAccess.objects
+            .filter(user_id=rotation.user_id, pk__gt=last, encrypted_dek__isnull=False)
+            .order_by('pk')
+            .values_list('pk', 'encrypted_dek')[:batch_size]
+        )
+        if not rows:
+            return
+        last = rows[-1][0]
+        yield [(pk, bytes(encrypted_dek)) for pk, encrypted_dek in rows]
+
+
+# Yields (batch, rewrapped) in order with at most `window` batches queued
+# on the executor; without one the batches are re-wrapped inline.
+def _rewrapped(batches, old_private_pem, new_public_pem, executor, window):
+    if executor is None:
+        for batch in batches:
+            yield batch, rewrap_batch(old_private_pem, new_public_pem, batch)
+        return
+
+    pending = deque()
+    try:
+        for batch in batches:
+            if len(pending) >= window:
+                done, future = pending.popleft()
+                yield done, future.result()
+            pending.append((batch, executor.submit(rewrap_batch, old_private_pem, new_public_pem, batch)))
+
+        while pending:
+            done, future = pending.popleft()
+            yield done, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+# Takes the rotation if nobody holds a live lease on it and it is not
+# waiting out a retry delay. Returns None when it is not available.
+def claim_rotation(rotation_id, owner):
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.USERS_KEY_ROTATION_LEASE)
+
+    with transaction.atomic():
+        rotation = (
+            KeyRotation.objects.select_for_update(skip_locked=True)
+            .filter(
+                pk=rotation_id,
+                status__in=UNFINISHED,
+                attempts__lt=settings.USERS_KEY_ROTATION_MAX_ATTEMPTS
+            )
+            .filter(Q(owner='') | Q(heartbeat_at__lt=stale))
+            .filter(Q(retry_at__isnull=True) | Q(retry_at__lte=now))
+            .first()
+        )
+        if rotation is None:
+            return None
+
+        rotation.owner = owner
+        rotation.heartbeat_at = now
+        rotation.status = 'running'
+        rotation.error = ''
+        rotation.resumed_at = now
+        rotation.resumed_processed = rotation.processed
+        rotation.save(update_fields=[
+            'owner', 'heartbeat_at', 'status', 'error', 'resumed_at', 'resumed_processed', 'updated_at'
+        ])
+
+    return rotation
+
+
+# The lease is renewed first: the UPDATE also locks the rotation row, and
+# if another runner has taken over the batch is rolled back unapplied.
+def _checkpoint(rotation, owner, batch, rewrapped):
+    with transaction.atomic():
+        renewed = KeyRotation.objects.filter(pk=rotation.pk, owner=owner).update(
+            processed=F('processed') + len(batch),
+            last_access_id=batch[-1][0],
+            heartbeat_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+        if not renewed:
+            raise RotationLost()
+
+        for pk, old_dek, new_dek in rewrapped:
+            # A row re-shared since it was read already holds a DEK for the
+            # new key and must not be overwritten.
+            DocumentAccess.objects.filter(pk=pk, encrypted_dek=old_dek).update(encrypted_dek=new_dek)
+
+
+def _fail(rotation, owner, exc):
+    KeyRotation.objects.filter(pk=rotation.pk, owner=owner).update(
+        status='failed',
+        error=repr(exc),
+        owner='',
+        attempts=F('attempts') + 1,
+        retry_at=timezone.now() + timedelta(
+            seconds=settings.USERS_KEY_ROTATION_RETRY_DELAY * 2 ** rotation.attempts
+        )
+    )
+
+
+def _finish(rotation, owner):
+    with transaction.atomic():
+        # Every row has been visited, so the count of visited rows becomes
+        # the total; rows shared or revoked meanwhile moved it either way.
+        finished = KeyRotation.objects.filter(pk=rotation.pk, owner=owner).update(
+            status='completed',
+            owner='',
+            total=F('processed'),
+            finished_at=timezone.now()
+        )
+        if not finished:
+            raise RotationLost()
+        User.objects.filter(pk=rotation.user_id).update(previous_private_key=None)
+
+    # Only this process's caches; entries elsewhere still hold valid DEKs
+    # and the old parsed key, and expire with their TTL.
+    invalidate_user_keys(rotation.user_id)
+    invalidate_user_deks(rotation.user_id)
+
+
+# Claims the rotation and re-wraps its remaining DEKs from the checkpoint
+# on, so a crashed or failed rotation resumes where it stopped. Returns
+# None if another runner holds it or takes it over. `progress` is called
+# with the refreshed rotation after every committed batch.
+def run_rotation(rotation, executor=None, batch_size=None, window=None, progress=None):
+    batch_size = batch_size or settings.USERS_KEY_ROTATION_BATCH_SIZE
+    window = window or 2
+    owner = uuid.uuid4().hex
+
+    rotation = claim_rotation(rotation.pk, owner)
+    if rotation is None:
+        return None
+    user = User.objects.get(pk=rotation.user_id)
+
+    try:
+        if user.previous_private_key:
+            batches = _batches(rotation, batch_size)
+            old_private_pem = user.previous_private_key.encode()
+            new_public_pem = user.public_key.encode()
+
+            for batch, rewrapped in _rewrapped(batches, old_private_pem, new_public_pem, executor, window):
+                _checkpoint(rotation, owner, batch, rewrapped)
+                if progress is not None:
+                    rotation.refresh_from_db()
+                    progress(rotation)
+
+        _finish(rotation, owner)
+    except RotationLost:
+        return None
+    except Exception as exc:
+        _fail(rotation, owner, exc)
+        raise
+
+    rotation.refresh_from_db()
+    return rotation
+
+
+def unfinished_rotations():
+    return KeyRotation.objects.filter(status__in=UNFINISHED).order_by('started_at')
@@ -1,9 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 
-from .serializers import UserProfileSerializer
+from audit.utils.audit import log_action
+from audit.utils.request import get_client_ip
+from config.constants import AuditAction
+from .serializers import KeyRotationSerializer, UserProfileSerializer
+from .utils.rotation import RotationInProgress, run_rotation, start_rotation
+
+# Runs rotations started through the API when USERS_KEY_ROTATION_IN_PROCESS
+# is set; one at a time, so a burst of requests cannot pin the web process.
+rotation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='key-rotation')
 
 @api_view(['GET', 'PUT'])
 @permission_classes([IsAuthenticated])
@@ -18,3 +30,43 @@ def user_profile_view(request):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _run_rotation(rotation):
+    try:
+        run_rotation(rotation)
+    finally:
+        connection.close()
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def key_rotation_view(request):
+    if request.method == 'GET':
+        rotation = request.user.key_rotations.first()
+        if rotation is None:
+            return Response({"detail": "No key rotation."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(KeyRotationSerializer(rotation).data)
+
+    try:
+        rotation = start_rotation(request.user, started_by=request.user)
+    except RotationInProgress:
+        return Response({"detail": "A key rotation is already in progress."}, status=status.HTTP_409_CONFLICT)
+
+    log_action(
+        user=request.user,
+        action=AuditAction.UPDATE,
+        target_type="User",
+        target_id=request.user.id,
+        old_data=None,
+        new_data={
+            "key_rotation": rotation.id,
+            "total": rotation.total
+        },
+        ip_address=get_client_ip(request)
+    )
+
+    if settings.USERS_KEY_ROTATION_IN_PROCESS:
+        rotation_executor.submit(_run_rotation, rotation)
+
+    return Response(KeyRotationSerializer(rotation).data, status=status.HTTP_202_ACCEPTED)